@@ -0,0 +1,13 @@
+# agendamentos/signals.py
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import BarberAvailability
+from .utils import availability_cache_key
+
+
+@receiver([post_save, post_delete], sender=BarberAvailability)
+def invalidate_availability_cache(sender, instance: BarberAvailability, **kwargs):
+    """Regra mudou (inclusive de dia da semana): descarta o cache dos 7 dias do barbeiro."""
+    cache.delete_many([availability_cache_key(instance.barbeiro_id, wd) for wd in range(7)])
@@ -1,3 +1,55 @@
+from datetime import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from .models import BarberAvailability
+from .utils import availability_rules_cached
+
+
+class AvailabilityCacheInvalidationTests(TestCase):
+    """Regras semanais em cache: os sinais de BarberAvailability descartam os 7 dias do barbeiro."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.barbeiro = get_user_model().objects.create_user("barbeiro")
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _regra(self, weekday=0, **kwargs):
+        return BarberAvailability.objects.create(
+            barbeiro=self.barbeiro, weekday=weekday, start_time=time(9), end_time=time(18), **kwargs
+        )
+
+    def test_new_rule_invalidates(self):
+        self.assertEqual(availability_rules_cached(self.barbeiro.pk, 0), ())
+        self._regra()
+        self.assertEqual(availability_rules_cached(self.barbeiro.pk, 0), ((time(9), time(18)),))
+
+    def test_edit_and_deactivate_invalidate(self):
+        regra = self._regra()
+        availability_rules_cached(self.barbeiro.pk, 0)
+        regra.end_time = time(12)
+        regra.save()
+        self.assertEqual(availability_rules_cached(self.barbeiro.pk, 0), ((time(9), time(12)),))
+        regra.is_active = False
+        regra.save()
+        self.assertEqual(availability_rules_cached(self.barbeiro.pk, 0), ())
+
+    def test_weekday_change_invalidates_old_and_new_day(self):
+        regra = self._regra(weekday=0)
+        availability_rules_cached(self.barbeiro.pk, 0)
+        self.assertEqual(availability_rules_cached(self.barbeiro.pk, 2), ())
+        regra.weekday = 2
+        regra.save()
+        self.assertEqual(availability_rules_cached(self.barbeiro.pk, 0), ())
+        self.assertEqual(availability_rules_cached(self.barbeiro.pk, 2), ((time(9), time(18)),))
+
+    def test_delete_invalidates(self):
+        regra = self._regra()
+        availability_rules_cached(self.barbeiro.pk, 0)
+        regra.delete()
+        self.assertEqual(availability_rules_cached(self.barbeiro.pk, 0), ())
@@ -1,9 +1,29 @@
 # agendamentos/utils.py
 from datetime import datetime, timedelta, date, time
+from django.core.cache import cache
 from django.utils import timezone
 from .models import BarberAvailability, BarberTimeOff
 from django.utils import timezone
 
+AVAILABILITY_CACHE_TTL = 600  # segundos; os sinais de BarberAvailability invalidam antes
+
+def availability_cache_key(user_id, weekday):
+    return f"avail:{user_id}:{weekday}"
+
+def availability_rules_cached(user_id, weekday):
+    """
+    Regras ativas do barbeiro no dia da semana como tupla de (start_time, end_time),
+    via cache (mudam raramente; invalidadas em agendamentos.signals).
+    """
+    return cache.get_or_set(
+        availability_cache_key(user_id, weekday),
+        lambda: tuple(
+            BarberAvailability.objects.filter(barbeiro_id=user_id, weekday=weekday, is_active=True)
+            .values_list("start_time", "end_time")
+        ),
+        AVAILABILITY_CACHE_TTL,
+    )
+
 def _aware(dt_naive, tz):
     return timezone.make_aware(dt_naive, tz)
 
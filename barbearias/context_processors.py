@@ -1,5 +1,4 @@
-from .models import BarberShop
-from .utils import get_default_shop_for
+from .utils import get_session_shop
 
 
 def shop_context(request):
@@ -7,23 +6,8 @@ def shop_context(request):
     if not request.user.is_authenticated:
         return {"shop": None, "shop_slug": None}
 
-    shop_id = request.session.get("shop_id")
-
-    shop = None
-    if shop_id:
-        try:
-            shop = BarberShop.objects.get(id=shop_id)
-        except BarberShop.DoesNotExist:
-            request.session.pop("shop_id", None)
-
-    if not shop:
-        sid = get_default_shop_for(request.user)
-        if sid:
-            try:
-                shop = BarberShop.objects.get(id=sid)
-                request.session["shop_id"] = sid
-            except BarberShop.DoesNotExist:
-                pass
+    # sessão (ou padrão do usuário, gravada na sessão) lida do cache por id
+    shop = get_session_shop(request)
 
     return {
         "shop": shop,
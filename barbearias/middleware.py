@@ -1,13 +1,8 @@
-from django.shortcuts import get_object_or_404
-from django.urls import resolve
-from django.utils.deprecation import MiddlewareMixin
-import barbearias
-from .models import BarberShop
-
 # barbearias/middleware.py
 from django.utils.deprecation import MiddlewareMixin
 from django.urls import resolve
 from barbearias.models import BarberShop  # <- importa o MODEL certo
+from core.access import SHOP_LIGHT_FIELDS
 
 class ShopSlugMiddleware(MiddlewareMixin):
     def process_request(self, request):
@@ -27,7 +22,8 @@ class ShopSlugMiddleware(MiddlewareMixin):
             return
 
         try:
-            request.shop = BarberShop.objects.get(slug=shop_slug)
+            # só as colunas leves (cobertas pelo índice barbearias_shop_slug_covering no Postgres)
+            request.shop = BarberShop.objects.only(*SHOP_LIGHT_FIELDS).get(slug=shop_slug)
         except BarberShop.DoesNotExist:
             request.shop = None
 
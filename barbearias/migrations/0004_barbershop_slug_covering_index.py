@@ -0,0 +1,35 @@
+# Índice de cobertura para a resolução da barbearia pelo slug da URL (PostgreSQL).
+#
+# ShopSlugMiddleware/require_shop_member carregam só as colunas leves
+# (core.access.SHOP_LIGHT_FIELDS); com INCLUDE o lookup por slug vira um
+# index-only scan. INCLUDE não existe no SQLite de dev: lá a migração não faz nada.
+
+from django.db import migrations
+
+INDEX_NAME = "barbearias_shop_slug_covering"
+
+
+def create_covering_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON barbearias_barbershop "
+        "(slug) INCLUDE (id, owner_id, nome, timezone)"
+    )
+
+
+def drop_covering_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barbearias', '0003_barbershop_api_key_barbershop_instance'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_covering_index, drop_covering_index),
+    ]
@@ -2,7 +2,8 @@
 from __future__ import annotations
 
 from django.db import transaction
-from django.db.models.signals import post_save, pre_delete
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
 from .models import (
@@ -11,6 +12,7 @@ from .models import (
     Membership,
     MembershipRole,
 )
+from .utils import active_member_cache_key, manager_cache_key, shop_id_cache_key, shop_slug_cache_key
 
 # ============================================================
 # Helpers
@@ -52,6 +54,36 @@ def ensure_owner_membership(sender, instance: BarberShop, created: bool, **kwarg
     transaction.on_commit(_do)
 
 
+@receiver(pre_save, sender=BarberShop)
+def remember_old_slug(sender, instance: BarberShop, **kwargs):
+    """Guarda o slug gravado antes do save: numa troca de slug a chave antiga também sai do cache."""
+    instance._slug_antes = None
+    if instance.pk:
+        instance._slug_antes = sender.objects.filter(pk=instance.pk).values_list("slug", flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=BarberShop)
+def invalidate_shop_slug_cache(sender, instance: BarberShop, **kwargs):
+    """Remove a barbearia dos caches por slug/id (utils.get_shop_by_slug_cached/get_shop_by_id_cached)."""
+    keys = [shop_slug_cache_key(instance.slug), shop_id_cache_key(instance.pk)]
+    old_slug = getattr(instance, "_slug_antes", None)
+    if old_slug and old_slug != instance.slug:
+        keys.append(shop_slug_cache_key(old_slug))
+    cache.delete_many(keys)
+
+
+@receiver([post_save, post_delete], sender=Membership)
+def invalidate_manager_cache(sender, instance: Membership, **kwargs):
+    """
+    Papel/atividade mudou: descarta os caches de user_is_manager e de membership ativa
+    (get_session_shop) desse par usuário/barbearia.
+    """
+    cache.delete_many([
+        manager_cache_key(instance.user_id, instance.shop_id),
+        active_member_cache_key(instance.user_id, instance.shop_id),
+    ])
+
+
 # ============================================================
 # 2) BarberProfile -> Membership (BARBER)
 #    - cria membership BARBER ao criar profile
@@ -1,3 +1,122 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from painel.helpers import user_is_manager
+from .models import BarberShop, Membership, MembershipRole
+from .utils import (
+    get_session_shop,
+    get_shop_by_id_cached,
+    get_shop_by_slug_cached,
+    is_active_member_cached,
+)
+
+
+class ShopCacheInvalidationTests(TestCase):
+    """Caches de barbearia por slug/id: colunas leves e invalidados pelos sinais."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.shop = BarberShop.objects.create(
+            nome="Barbearia Teste", slug="barbearia-teste", api_key="segredo", instance="inst-1",
+        )
+
+    def test_cached_shops_carry_only_light_fields(self):
+        for shop in (get_shop_by_slug_cached("barbearia-teste"), get_shop_by_id_cached(self.shop.pk)):
+            self.assertIn("api_key", shop.get_deferred_fields())
+            self.assertIn("instance", shop.get_deferred_fields())
+
+    def test_unknown_slug_is_cached_as_missing(self):
+        self.assertIsNone(get_shop_by_slug_cached("nao-existe"))
+        BarberShop.objects.create(nome="Nova", slug="nao-existe")  # o sinal limpa a chave
+        self.assertEqual(get_shop_by_slug_cached("nao-existe").nome, "Nova")
+
+    def test_save_invalidates_slug_and_id(self):
+        get_shop_by_slug_cached("barbearia-teste")
+        get_shop_by_id_cached(self.shop.pk)
+        self.shop.nome = "Renomeada"
+        self.shop.save()
+        self.assertEqual(get_shop_by_slug_cached("barbearia-teste").nome, "Renomeada")
+        self.assertEqual(get_shop_by_id_cached(self.shop.pk).nome, "Renomeada")
+
+    def test_slug_change_drops_old_slug(self):
+        self.assertIsNotNone(get_shop_by_slug_cached("barbearia-teste"))
+        self.shop.slug = "novo-slug"
+        self.shop.save()
+        self.assertIsNone(get_shop_by_slug_cached("barbearia-teste"))
+        self.assertEqual(get_shop_by_slug_cached("novo-slug").pk, self.shop.pk)
+
+    def test_delete_invalidates(self):
+        pk = self.shop.pk
+        get_shop_by_slug_cached("barbearia-teste")
+        get_shop_by_id_cached(pk)
+        self.shop.delete()
+        self.assertIsNone(get_shop_by_slug_cached("barbearia-teste"))
+        self.assertIsNone(get_shop_by_id_cached(pk))
+
+
+class MembershipCacheInvalidationTests(TestCase):
+    """Caches de papel (user_is_manager) e de membership ativa (get_session_shop)."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user("gerente", password="x")
+        self.shop = BarberShop.objects.create(nome="Barbearia Teste", slug="barbearia-teste")
+        self.outra = BarberShop.objects.create(nome="Outra", slug="outra")
+        self.mem = Membership.objects.create(user=self.user, shop=self.shop, role=MembershipRole.MANAGER)
+
+    def _fresh_user(self):
+        # user_is_manager memoriza no objeto (vive um request): simula o próximo request
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def test_role_change_invalidates_manager_cache(self):
+        self.assertTrue(user_is_manager(self._fresh_user(), self.shop))
+        self.mem.role = MembershipRole.BARBER
+        self.mem.save()
+        self.assertFalse(user_is_manager(self._fresh_user(), self.shop))
+
+    def test_deactivation_invalidates_member_cache(self):
+        self.assertTrue(is_active_member_cached(self.user.pk, self.shop.pk))
+        self.mem.is_active = False
+        self.mem.save()
+        self.assertFalse(is_active_member_cached(self.user.pk, self.shop.pk))
+        self.assertFalse(user_is_manager(self._fresh_user(), self.shop))
+
+    def test_delete_invalidates_member_cache(self):
+        self.assertTrue(is_active_member_cached(self.user.pk, self.shop.pk))
+        self.mem.delete()
+        self.assertFalse(is_active_member_cached(self.user.pk, self.shop.pk))
+
+    def _request(self, shop_id):
+        request = RequestFactory().get("/")
+        request.user = self.user
+        request.session = SessionStore()
+        request.session["shop_id"] = shop_id
+        return request
+
+    def test_session_shop_kept_while_membership_active(self):
+        request = self._request(self.shop.pk)
+        self.assertEqual(get_session_shop(request).pk, self.shop.pk)
+
+    def test_session_shop_dropped_after_deactivation(self):
+        Membership.objects.create(user=self.user, shop=self.outra, role=MembershipRole.MANAGER)
+        request = self._request(self.shop.pk)
+        self.assertEqual(get_session_shop(request).pk, self.shop.pk)
+        self.mem.is_active = False
+        self.mem.save()
+        self.assertEqual(get_session_shop(request).pk, self.outra.pk)
+        self.assertEqual(request.session["shop_id"], self.outra.pk)
+
+    def test_foreign_session_shop_falls_back_to_default(self):
+        request = self._request(self.outra.pk)  # nunca foi membro
+        self.assertEqual(get_session_shop(request).pk, self.shop.pk)
+        self.assertEqual(request.session["shop_id"], self.shop.pk)
+
+    def test_session_shop_cleared_without_any_membership(self):
+        self.mem.delete()
+        request = self._request(self.shop.pk)
+        self.assertIsNone(get_session_shop(request))
+        self.assertNotIn("shop_id", request.session)
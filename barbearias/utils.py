@@ -1,5 +1,13 @@
 # barbearias/utils.py
-from .models import Membership
+from django.core.cache import cache
+
+from core.access import SHOP_LIGHT_FIELDS
+
+from .models import BarberShop, Membership
+
+SHOP_SLUG_CACHE_TTL = 60  # segundos
+SHOP_ID_CACHE_TTL = 300  # segundos
+MANAGER_CACHE_TTL = 120  # segundos
 
 def get_default_shop_for(user):
     # pega a primeira associação ativa
@@ -10,3 +18,78 @@ def get_default_shop_for(user):
         .values_list("shop_id", flat=True)
         .first()
     )
+
+
+def manager_cache_key(user_id, shop_id):
+    """Chave do cache de 'usuário é OWNER/MANAGER da barbearia' (painel.helpers.user_is_manager)."""
+    return f"mgr:{user_id}:{shop_id}"
+
+def shop_slug_cache_key(slug):
+    return f"shop:slug:{slug}"
+
+def get_shop_by_slug_cached(slug):
+    """
+    BarberShop pelo slug via cache (TTL curto; invalidado nos sinais da barbearia).
+    Slug inexistente também fica em cache (como False) para não bater no banco a cada request.
+    Só as colunas leves vão para o cache compartilhado (nada de api_key/instance).
+    """
+    key = shop_slug_cache_key(slug)
+    shop = cache.get(key)
+    if shop is None:
+        shop = BarberShop.objects.only(*SHOP_LIGHT_FIELDS).filter(slug=slug).first() or False
+        cache.set(key, shop, SHOP_SLUG_CACHE_TTL)
+    return shop or None
+
+def shop_id_cache_key(shop_id):
+    return f"shop:id:{shop_id}"
+
+def get_shop_by_id_cached(shop_id):
+    """
+    BarberShop pelo id via cache (mesma linha em todo request do usuário; invalidado nos
+    sinais da barbearia). Id inexistente também fica em cache (como False).
+    Como no cache por slug, só as colunas leves (SHOP_LIGHT_FIELDS) — é o que os
+    templates do painel leem (nome/slug); nada de api_key/instance no cache compartilhado.
+    """
+    if not shop_id:
+        return None
+    key = shop_id_cache_key(shop_id)
+    shop = cache.get(key)
+    if shop is None:
+        shop = BarberShop.objects.only(*SHOP_LIGHT_FIELDS).filter(id=shop_id).first() or False
+        cache.set(key, shop, SHOP_ID_CACHE_TTL)
+    return shop or None
+
+def active_member_cache_key(user_id, shop_id):
+    """Chave do cache de 'usuário tem membership ativa na barbearia' (get_session_shop)."""
+    return f"member:{user_id}:{shop_id}"
+
+def is_active_member_cached(user_id, shop_id):
+    """
+    True se o usuário tiver membership ativa na barbearia. Em cache por MANAGER_CACHE_TTL;
+    os sinais de Membership apagam a chave.
+    """
+    return cache.get_or_set(
+        active_member_cache_key(user_id, shop_id),
+        lambda: Membership.objects.filter(user_id=user_id, shop_id=shop_id, is_active=True).exists(),
+        MANAGER_CACHE_TTL,
+    )
+
+def get_session_shop(request):
+    """
+    Barbearia ativa do usuário: a da sessão (shop_id), se a membership nela ainda estiver
+    ativa, ou a padrão (get_default_shop_for), que passa a ficar na sessão. Lida do cache por id.
+    """
+    if not request.user.is_authenticated:
+        return None
+    shop = get_shop_by_id_cached(request.session.get("shop_id"))
+    # membership desativada/removida depois do login: a barbearia da sessão deixa de valer
+    if shop is not None and not is_active_member_cached(request.user.pk, shop.pk):
+        shop = None
+    if shop is None:
+        sid = get_default_shop_for(request.user)
+        shop = get_shop_by_id_cached(sid)
+        if shop is not None:
+            request.session["shop_id"] = sid
+        else:
+            request.session.pop("shop_id", None)
+    return shop
@@ -25,8 +25,13 @@ except Exception:
 
 try:
     from clientes.models import Cliente
+    from core.contacts import find_or_create_cliente, normalize_phone
 except Exception:
     Cliente = None  # type: ignore
+    find_or_create_cliente = None  # type: ignore
+
+    def normalize_phone(raw):  # fallback: só dígitos
+        return "".join(ch for ch in (raw or "") if ch.isdigit())
 
 # Fonte canônica de ocupação
 try:
@@ -46,7 +51,9 @@ except Exception:
 # ===================== Helpers genéricos =====================
 
 def _normalize_phone(raw: str) -> str:
-    return "".join(ch for ch in (raw or "") if ch.isdigit())
+    # mesma normalização (E.164 BR, sem +) do intake via API; o que o normalizador BR
+    # rejeita (estrangeiro, sem DDD) segue aceito como só dígitos, como antes
+    return normalize_phone(raw) or "".join(ch for ch in (raw or "") if ch.isdigit())
 
 
 def _safe_int(s: str | None) -> Optional[int]:
@@ -90,78 +97,11 @@ def _servico_by_id_for_shop(servico_id: int | None, shop: BarberShop) -> Optiona
 
 # ===================== Cliente: localizar / criar =====================
 
-def _get_cliente_phone_fields() -> List[str]:
-    candidates = ["telefone", "phone", "whatsapp", "celular", "mobile", "phone_number"]
-    if not Cliente:
-        return []
-    return [f for f in candidates if hasattr(Cliente, f)]
-
-
-def _buscar_cliente_por_telefone(shop: BarberShop, telefone_digits: str):
-    if not (Cliente and telefone_digits):
-        return None
-    qs = Cliente.objects.all()
-    if hasattr(Cliente, "shop_id"):
-        qs = qs.filter(shop=shop)
-
-    for field in _get_cliente_phone_fields():
-        exact = {field: telefone_digits}
-        obj = qs.filter(**exact).first()
-        if obj:
-            return obj
-        # regex que ignora máscara (pode não ser suportado por todos os backends)
-        try:
-            pattern = r"\D*".join(list(telefone_digits))
-            obj = qs.filter(**{f"{field}__regex": pattern}).first()
-            if obj:
-                return obj
-        except Exception:
-            pass
-    return None
-
-
 def _criar_ou_atualizar_cliente(shop: BarberShop, telefone_digits: str, nome: str | None):
     if not Cliente:
         return None
-
-    cli = _buscar_cliente_por_telefone(shop, telefone_digits)
-    if cli:
-        try:
-            nome_atual = getattr(cli, "nome", "") or getattr(cli, "name", "") or ""
-            if (not nome_atual) and (nome or "").strip():
-                if hasattr(cli, "nome"):
-                    cli.nome = nome.strip()
-                    cli.save(update_fields=["nome"])
-                elif hasattr(cli, "name"):
-                    cli.name = nome.strip()
-                    cli.save(update_fields=["name"])
-        except Exception:
-            pass
-        return cli
-
-    # criar novo
-    cli = Cliente()
-    if hasattr(Cliente, "shop_id"):
-        setattr(cli, "shop", shop)
-
-    if hasattr(cli, "nome"):
-        cli.nome = (nome or telefone_digits).strip()
-    elif hasattr(cli, "name"):
-        cli.name = (nome or telefone_digits).strip()
-
-    tel_fields = _get_cliente_phone_fields()
-    if tel_fields:
-        setattr(cli, tel_fields[0], telefone_digits)
-
-    for f in ["ativo", "is_active", "status"]:
-        if hasattr(cli, f):
-            try:
-                setattr(cli, f, True if f != "status" else "ATIVO")
-            except Exception:
-                pass
-
-    cli.save()
-    return cli
+    # match exato/sufixo/nome + criação ficam centralizados em core.contacts
+    return find_or_create_cliente(shop, nome=nome, telefone=telefone_digits)
 
 
 # ===================== Disponibilidade (JSON) =====================
@@ -430,8 +370,10 @@ def _criar_solicitacao(request, shop: BarberShop, barber_obj=None) -> Solicitaca
     # Anti-duplicação simples (últimos 2 min)
     if hasattr(Solicitacao, "criado_em"):
         dois_min_antes = timezone.now() - timezone.timedelta(minutes=2)
+        # pelos últimos 8 dígitos: casa tanto as pendentes gravadas como 55… quanto as
+        # antigas, só com os dígitos digitados
         dup = (Solicitacao.objects
-               .filter(shop=shop, telefone=telefone_digits, status=SolicitacaoStatus.PENDENTE)
+               .filter(shop=shop, telefone__endswith=telefone_digits[-8:], status=SolicitacaoStatus.PENDENTE)
                .filter(criado_em__gte=dois_min_antes))
         if dt:
             dup = dup.filter(inicio=dt)
@@ -1,14 +1,6 @@
 from django import forms
 from django.forms import inlineformset_factory
 from .models import Cliente, HistoricoItem
-import re
-
-def _norm_tel(s: str) -> str:
-    if not s:
-        return ""
-    # pega só dígitos; se tiver 11 dígitos, formata (31) 98888-7777
-    digits = re.sub(r"\D+", "", s)
-    return digits
 
 
 class ClienteForm(forms.ModelForm):
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barbearias', '0003_barbershop_api_key_barbershop_instance'),
+        ('clientes', '0002_historicoitem_shop_alter_cliente_telefone_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['shop', 'nome', 'id'], name='clientes_cl_shop_id_b25855_idx'),
+        ),
+    ]
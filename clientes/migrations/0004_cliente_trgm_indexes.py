@@ -0,0 +1,46 @@
+# Índices trigram (pg_trgm) para a busca por substring em clientes_list.
+#
+# O Django traduz `nome__icontains=q` no PostgreSQL para
+# `UPPER("nome"::text) LIKE UPPER('%q%')`, então o índice precisa ser sobre
+# a mesma expressão para o planner usá-lo. Em outros bancos (SQLite de dev)
+# a migração não faz nada.
+
+from django.db import migrations
+
+TRGM_INDEXES = [
+    ("cliente_nome_trgm", "nome"),
+    ("cliente_telefone_trgm", "telefone"),
+]
+
+
+def _is_postgres(schema_editor):
+    return schema_editor.connection.vendor == "postgresql"
+
+
+def create_trgm_indexes(apps, schema_editor):
+    if not _is_postgres(schema_editor):
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRGM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON clientes_cliente '
+            f'USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trgm_indexes(apps, schema_editor):
+    if not _is_postgres(schema_editor):
+        return
+    for name, _ in TRGM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0003_cliente_shop_nome_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trgm_indexes, drop_trgm_indexes),
+    ]
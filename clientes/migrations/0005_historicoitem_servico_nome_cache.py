@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:26
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def backfill_servico_nome_cache(apps, schema_editor):
+    HistoricoItem = apps.get_model("clientes", "HistoricoItem")
+    Servico = apps.get_model("servicos", "Servico")
+
+    # um UPDATE com subquery correlacionada para os itens com serviço do catálogo...
+    HistoricoItem.objects.filter(servico_ref__isnull=False).update(
+        servico_nome_cache=Subquery(Servico.objects.filter(pk=OuterRef("servico_ref_id")).values("nome")[:1])
+    )
+    # ...e outro copiando o texto livre para o restante
+    HistoricoItem.objects.filter(servico_ref__isnull=True).update(servico_nome_cache=F("servico"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0004_cliente_trgm_indexes'),
+        ('servicos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicoitem',
+            name='servico_nome_cache',
+            field=models.CharField(blank=True, max_length=120),
+        ),
+        migrations.RunPython(backfill_servico_nome_cache, migrations.RunPython.noop),
+    ]
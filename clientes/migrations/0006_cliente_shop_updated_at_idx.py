@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barbearias', '0003_barbershop_api_key_barbershop_instance'),
+        ('clientes', '0005_historicoitem_servico_nome_cache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['shop', 'updated_at'], name='clientes_cl_shop_id_d5da08_idx'),
+        ),
+    ]
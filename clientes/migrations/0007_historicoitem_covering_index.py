@@ -0,0 +1,37 @@
+# Índice de cobertura para o histórico em cliente_detail (PostgreSQL).
+#
+# A listagem lê só (data, valor, faltou, profissional, servico/servico_nome_cache)
+# filtrando por cliente + shop e ordenando por data desc; com INCLUDE o planner
+# consegue um index-only scan. INCLUDE não existe no SQLite de dev, então a
+# migração não faz nada fora do Postgres.
+
+from django.db import migrations
+
+INDEX_NAME = "historicoitem_cliente_data_cov"
+
+
+def create_covering_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON clientes_historicoitem "
+        "(cliente_id, data DESC) "
+        "INCLUDE (shop_id, servico, servico_nome_cache, valor, faltou, profissional)"
+    )
+
+
+def drop_covering_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0006_cliente_shop_updated_at_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_covering_index, drop_covering_index),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barbearias', '0003_barbershop_api_key_barbershop_instance'),
+        ('clientes', '0007_historicoitem_covering_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['shop', 'recorrencia_status', 'ultimo_corte'], name='cliente_shop_status_uc'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['shop', 'ultimo_corte'], name='cliente_shop_uc'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:34
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barbearias', '0003_barbershop_api_key_barbershop_instance'),
+        ('clientes', '0008_cliente_recorrencia_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(models.F('shop'), django.db.models.functions.text.Right('telefone', 8), name='clientes_tel_suffix8_idx'),
+        ),
+    ]
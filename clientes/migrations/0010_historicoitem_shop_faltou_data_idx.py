@@ -0,0 +1,41 @@
+# Índice (shop, faltou, data) para os agregados do dashboard.
+#
+# No PostgreSQL é criado com CREATE INDEX CONCURRENTLY (sem travar escrita na
+# tabela de histórico); por isso a migração não é atômica. Nos demais bancos
+# segue o add_index normal.
+
+from django.db import migrations, models
+
+INDEX = models.Index(fields=["shop", "faltou", "data"], name="historico_shop_faltou_data")
+
+
+def add_index(apps, schema_editor):
+    model = apps.get_model("clientes", "HistoricoItem")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.add_index(model, INDEX, concurrently=True)
+    else:
+        schema_editor.add_index(model, INDEX)
+
+
+def remove_index(apps, schema_editor):
+    model = apps.get_model("clientes", "HistoricoItem")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.remove_index(model, INDEX, concurrently=True)
+    else:
+        schema_editor.remove_index(model, INDEX)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('clientes', '0009_cliente_tel_suffix8_idx'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(add_index, remove_index)],
+            state_operations=[migrations.AddIndex(model_name='historicoitem', index=INDEX)],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Índice (shop, created_at DESC) para a lista de clientes do painel.
+#
+# No PostgreSQL é criado com CREATE INDEX CONCURRENTLY (sem travar escrita na
+# tabela de clientes); por isso a migração não é atômica. Nos demais bancos
+# segue o add_index normal.
+
+from django.db import migrations, models
+
+INDEX = models.Index(fields=["shop", "-created_at"], name="cliente_shop_created_desc")
+
+
+def add_index(apps, schema_editor):
+    model = apps.get_model("clientes", "Cliente")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.add_index(model, INDEX, concurrently=True)
+    else:
+        schema_editor.add_index(model, INDEX)
+
+
+def remove_index(apps, schema_editor):
+    model = apps.get_model("clientes", "Cliente")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.remove_index(model, INDEX, concurrently=True)
+    else:
+        schema_editor.remove_index(model, INDEX)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('clientes', '0010_historicoitem_shop_faltou_data_idx'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(add_index, remove_index)],
+            state_operations=[migrations.AddIndex(model_name='cliente', index=INDEX)],
+        ),
+    ]
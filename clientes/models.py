@@ -1,9 +1,14 @@
 # clientes/models.py
+from datetime import timedelta
 from decimal import Decimal
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce, Greatest, Right
+from django.db.models.lookups import IsNull, LessThanOrEqual
 from django.utils import timezone
 
 from core import settings
+from .utils import bump_historico_version
 
 class Cliente(models.Model):
     class RecorrenciaStatus(models.TextChoices):
@@ -57,8 +62,43 @@ class Cliente(models.Model):
             if save:
                 self.save(update_fields=["recorrencia_status", "updated_at"])
 
+    @classmethod
+    def recorrencia_case(cls, cutoff_days=None, ultimo_corte=None):
+        """
+        Expressão SQL equivalente a refresh_recorrencia():
+        INATIVO se não há último corte ou se ele é anterior à janela de inatividade.
+        `ultimo_corte` permite avaliar sobre o valor que está sendo gravado no mesmo UPDATE.
+        """
+        cutoff_days = cutoff_days or getattr(settings, "CLIENTE_INATIVO_DIAS", 60)
+        cutoff = timezone.now() - timedelta(days=cutoff_days)
+        ultimo_corte = ultimo_corte if ultimo_corte is not None else F("ultimo_corte")
+        return Case(
+            When(IsNull(ultimo_corte, True), then=Value(cls.RecorrenciaStatus.INATIVO)),
+            When(LessThanOrEqual(ultimo_corte, cutoff), then=Value(cls.RecorrenciaStatus.INATIVO)),
+            default=Value(cls.RecorrenciaStatus.ATIVO),
+            output_field=models.CharField(),
+        )
+
+    @classmethod
+    def bulk_refresh_recorrencia(cls, shop, cutoff_days=None) -> int:
+        """Recalcula ATIVO/INATIVO de todos os clientes da barbearia num único UPDATE."""
+        return cls.objects.filter(shop=shop).update(
+            recorrencia_status=cls.recorrencia_case(cutoff_days),
+            updated_at=timezone.now(),
+        )
+
     class Meta:
-        indexes = [models.Index(fields=["nome"])]
+        indexes = [
+            models.Index(fields=["nome"]),
+            models.Index(fields=["shop", "nome", "id"]),  # paginação por keyset
+            models.Index(fields=["shop", "updated_at"]),   # ETag da listagem (Max(updated_at))
+            models.Index(fields=["shop", "-created_at"], name="cliente_shop_created_desc"),  # painel/clientes
+            # filtros de recorrência/inativos: igualdade primeiro, faixa (ultimo_corte) por último
+            models.Index(fields=["shop", "recorrencia_status", "ultimo_corte"], name="cliente_shop_status_uc"),
+            models.Index(fields=["shop", "ultimo_corte"], name="cliente_shop_uc"),
+            # casamento por sufixo do telefone em core.contacts.find_or_create_cliente
+            models.Index(F("shop"), Right("telefone", 8), name="clientes_tel_suffix8_idx"),
+        ]
         ordering = ["nome"]
         constraints = [
             models.UniqueConstraint(
@@ -86,12 +126,71 @@ class HistoricoItem(models.Model):
     data = models.DateTimeField()
     servico = models.CharField(max_length=120)
     servico_ref = models.ForeignKey("servicos.Servico", on_delete=models.SET_NULL, null=True, blank=True, related_name="itens")
+    # snapshot do nome exibido (evita JOIN com servico_ref nas listagens)
+    servico_nome_cache = models.CharField(max_length=120, blank=True)
     valor = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     preco_tabela = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     faltou = models.BooleanField(default=False)
     profissional = models.CharField(max_length=120, null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now, editable=False)
 
+    @property
+    def servico_label(self) -> str:
+        return self.servico_nome_cache or self.servico or "Serviço"
+
+    def _fill_servico_nome_cache(self):
+        if self.servico_ref_id:
+            self.servico_nome_cache = self.servico_ref.nome
+        else:
+            self.servico_nome_cache = self.servico or ""
+
+    def save(self, *args, **kwargs):
+        self._fill_servico_nome_cache()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "servico_nome_cache" not in update_fields:
+            kwargs["update_fields"] = [*update_fields, "servico_nome_cache"]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def bulk_register(cls, shop, items, batch_size=1000):
+        """
+        Insere vários itens de histórico (dicts com os campos do model) via bulk_create
+        e atualiza o último corte (e a recorrência) de cada cliente num único UPDATE.
+        """
+        objs = [cls(shop=shop, **item) for item in items]
+        if not objs:
+            return []
+        for o in objs:  # bulk_create não passa por save()
+            o._fill_servico_nome_cache()
+        cls.objects.bulk_create(objs, batch_size=batch_size)
+        # bulk_create não dispara post_save: invalida os gráficos do dashboard aqui
+        bump_historico_version(shop.pk)
+
+        # maior data (sem falta) por cliente
+        max_data = {}
+        for o in objs:
+            if o.faltou or not o.data:
+                continue
+            atual = max_data.get(o.cliente_id)
+            if atual is None or o.data > atual:
+                max_data[o.cliente_id] = o.data
+
+        if max_data:
+            ultimo_corte = Case(
+                *[
+                    When(pk=cid, then=Greatest(Coalesce(F("ultimo_corte"), Value(dt)), Value(dt)))
+                    for cid, dt in max_data.items()
+                ],
+                default=F("ultimo_corte"),
+            )
+            # recorrência avaliada sobre o novo último corte, no mesmo UPDATE (como _registrar_corte)
+            Cliente.objects.filter(pk__in=max_data.keys()).update(
+                ultimo_corte=ultimo_corte,
+                recorrencia_status=Cliente.recorrencia_case(ultimo_corte=ultimo_corte),
+                updated_at=timezone.now(),
+            )
+        return objs
+
     class Meta:
         ordering = ["-data"]
         indexes = [
@@ -99,4 +198,6 @@ class HistoricoItem(models.Model):
             models.Index(fields=["cliente", "data"]),
             models.Index(fields=["servico"]),
             models.Index(fields=["faltou"]),
+            # agregados do dashboard: loja + faltou (igualdade) e faixa de data por último
+            models.Index(fields=["shop", "faltou", "data"], name="historico_shop_faltou_data"),
         ]
\ No newline at end of file
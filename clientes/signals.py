@@ -0,0 +1,24 @@
+# clientes/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Cliente, HistoricoItem
+from .utils import bump_historico_version, invalidate_kpis
+
+
+@receiver([post_save, post_delete], sender=HistoricoItem)
+def historico_changed(sender, instance: HistoricoItem, **kwargs):
+    """Histórico mudou: nova versão para os gráficos em cache do dashboard."""
+    bump_historico_version(instance.shop_id)
+
+
+@receiver(post_save, sender=Cliente)
+def cliente_saved(sender, instance: Cliente, created=False, **kwargs):
+    """Cliente novo muda 'clientes novos do mês' nos KPIs do dashboard."""
+    if created:
+        invalidate_kpis(instance.shop_id, instance.created_at)
+
+
+@receiver(post_delete, sender=Cliente)
+def cliente_deleted(sender, instance: Cliente, **kwargs):
+    invalidate_kpis(instance.shop_id, instance.created_at)
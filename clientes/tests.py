@@ -1,3 +1,229 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from barbearias.models import BarberShop, Membership, MembershipRole
+from core.contacts import find_or_create_cliente, normalize_msisdn_br
+from .models import Cliente, HistoricoItem
+from .utils import historico_version
+from .views_web import CLIENTES_PAGE_SIZE, _keyset_page
+
+
+class BulkRegisterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = BarberShop.objects.create(nome="Barbearia Teste", slug="barbearia-teste")
+        cls.antigo = timezone.now() - timedelta(days=200)
+
+    def _cliente(self, nome, ultimo_corte=None, status=Cliente.RecorrenciaStatus.INATIVO):
+        return Cliente.objects.create(
+            shop=self.shop, nome=nome, ultimo_corte=ultimo_corte, recorrencia_status=status,
+        )
+
+    def test_recent_cut_reactivates_inactive_client(self):
+        c = self._cliente("Inativo", ultimo_corte=self.antigo)
+        recente = timezone.now() - timedelta(days=2)
+        HistoricoItem.bulk_register(self.shop, [{"cliente": c, "data": recente, "servico": "Corte"}])
+        c.refresh_from_db()
+        self.assertEqual(c.ultimo_corte, recente)
+        self.assertEqual(c.recorrencia_status, Cliente.RecorrenciaStatus.ATIVO)
+
+    def test_old_cut_keeps_newer_ultimo_corte_and_status(self):
+        recente = timezone.now() - timedelta(days=5)
+        c = self._cliente("Ativo", ultimo_corte=recente, status=Cliente.RecorrenciaStatus.ATIVO)
+        HistoricoItem.bulk_register(self.shop, [{"cliente": c, "data": self.antigo, "servico": "Corte"}])
+        c.refresh_from_db()
+        self.assertEqual(c.ultimo_corte, recente)
+        self.assertEqual(c.recorrencia_status, Cliente.RecorrenciaStatus.ATIVO)
+
+    def test_old_cut_on_client_without_history_stays_inactive(self):
+        c = self._cliente("Sem histórico", status=Cliente.RecorrenciaStatus.ATIVO)
+        HistoricoItem.bulk_register(self.shop, [{"cliente": c, "data": self.antigo, "servico": "Corte"}])
+        c.refresh_from_db()
+        self.assertEqual(c.ultimo_corte, self.antigo)
+        self.assertEqual(c.recorrencia_status, Cliente.RecorrenciaStatus.INATIVO)
+
+    def test_no_show_does_not_move_ultimo_corte(self):
+        c = self._cliente("Faltou", ultimo_corte=self.antigo)
+        HistoricoItem.bulk_register(
+            self.shop, [{"cliente": c, "data": timezone.now(), "servico": "Corte", "faltou": True}]
+        )
+        c.refresh_from_db()
+        self.assertEqual(c.ultimo_corte, self.antigo)
+        self.assertEqual(c.recorrencia_status, Cliente.RecorrenciaStatus.INATIVO)
+
+    def test_inserts_items_and_bumps_historico_version(self):
+        c = self._cliente("Vários")
+        antes = historico_version(self.shop.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            objs = HistoricoItem.bulk_register(self.shop, [
+                {"cliente": c, "data": timezone.now() - timedelta(days=d), "servico": "Corte"}
+                for d in (1, 3)
+            ])
+        self.assertEqual(len(objs), 2)
+        self.assertEqual(HistoricoItem.objects.filter(cliente=c, shop=self.shop).count(), 2)
+        self.assertTrue(all(o.servico_nome_cache == "Corte" for o in objs))
+        self.assertNotEqual(historico_version(self.shop.pk), antes)
+
+    def test_empty_items(self):
+        self.assertEqual(HistoricoItem.bulk_register(self.shop, []), [])
+
+
+class FindOrCreateClienteTests(TestCase):
+    """core.contacts.find_or_create_cliente: prioridade dos critérios e corrida no INSERT."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = BarberShop.objects.create(nome="Barbearia Teste", slug="barbearia-teste")
+        cls.outra = BarberShop.objects.create(nome="Outra", slug="outra")
+
+    def test_normalize_msisdn_br(self):
+        casos = {
+            "5511987654321": "5511987654321",
+            "+55 (11) 98765-4321": "5511987654321",
+            "11 98765-4321": "5511987654321",
+            "0055 11 98765 4321": "5511987654321",
+            "55011987654321": "5511987654321",
+            "1133334444": "551133334444",
+            "98765-4321": None,
+            "+44 20 7946 0958": None,
+            "": None,
+            None: None,
+        }
+        for raw, esperado in casos.items():
+            with self.subTest(raw=raw):
+                self.assertEqual(normalize_msisdn_br(raw), esperado)
+
+    def test_exact_match(self):
+        c = Cliente.objects.create(shop=self.shop, nome="Ana", telefone="5511987654321")
+        self.assertEqual(find_or_create_cliente(self.shop, "Outro Nome", "(11) 98765-4321").pk, c.pk)
+        self.assertEqual(Cliente.objects.count(), 1)
+
+    def test_exact_match_wins_over_suffix(self):
+        Cliente.objects.create(shop=self.shop, nome="Legado", telefone="87654321")
+        exato = Cliente.objects.create(shop=self.shop, nome="Zeca", telefone="5511987654321")
+        self.assertEqual(find_or_create_cliente(self.shop, "Zeca", "11987654321").pk, exato.pk)
+
+    def test_suffix_match_normalizes_phone(self):
+        c = Cliente.objects.create(shop=self.shop, nome="Bia", telefone="987654321")
+        achado = find_or_create_cliente(self.shop, "Bia", "11987654321")
+        self.assertEqual(achado.pk, c.pk)
+        self.assertEqual(achado.telefone, "5511987654321")
+        c.refresh_from_db()
+        self.assertEqual(c.telefone, "5511987654321")
+
+    def test_name_and_last4_match(self):
+        c = Cliente.objects.create(shop=self.shop, nome="Carlos", telefone="5521900004321")
+        achado = find_or_create_cliente(self.shop, "carlos", "11912344321")
+        self.assertEqual(achado.pk, c.pk)
+        self.assertEqual(achado.telefone, "5511912344321")
+
+    def test_phone_match_fills_empty_name_only(self):
+        vazio = Cliente.objects.create(shop=self.shop, nome="", telefone="5511911112222")
+        cheio = Cliente.objects.create(shop=self.shop, nome="Dora", telefone="5511933334444")
+        self.assertEqual(find_or_create_cliente(self.shop, "Eva", "5511911112222").nome, "Eva")
+        self.assertEqual(find_or_create_cliente(self.shop, "Eva", "5511933334444").nome, "Dora")
+        vazio.refresh_from_db()
+        cheio.refresh_from_db()
+        self.assertEqual((vazio.nome, cheio.nome), ("Eva", "Dora"))
+
+    def test_other_shop_is_not_matched(self):
+        Cliente.objects.create(shop=self.outra, nome="Ana", telefone="5511987654321")
+        c = find_or_create_cliente(self.shop, "Ana", "5511987654321")
+        self.assertEqual(c.shop_id, self.shop.pk)
+        self.assertEqual(Cliente.objects.filter(telefone="5511987654321").count(), 2)
+
+    def test_creates_with_normalized_phone(self):
+        c = find_or_create_cliente(self.shop, "  Fábio ", "(11) 98888-7777")
+        self.assertEqual((c.nome, c.telefone), ("Fábio", "5511988887777"))
+
+    def test_creates_without_phone(self):
+        c = find_or_create_cliente(self.shop, "Gil", "123")
+        self.assertIsNone(c.telefone)
+        self.assertEqual(find_or_create_cliente(self.shop, None, None).nome, "Cliente")
+
+    def test_concurrent_insert_returns_existing_row(self):
+        # outro intake gravou o mesmo número entre o nosso SELECT e o INSERT
+        outro = Cliente.objects.create(shop=self.shop, nome="Primeiro", telefone="5511977776666")
+        with mock.patch("django.db.models.query.QuerySet.first", return_value=None):
+            c = find_or_create_cliente(self.shop, "Segundo", "11977776666")
+        self.assertEqual(c.pk, outro.pk)
+        self.assertEqual(Cliente.objects.filter(shop=self.shop, telefone="5511977776666").count(), 1)
+
+
+class ClientesListViewTests(TestCase):
+    """Listagem: paginação por keyset (nome, id) e ETag/304."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("dono", password="x")
+        cls.shop = BarberShop.objects.create(nome="Barbearia Teste", slug="barbearia-teste")
+        Membership.objects.create(user=cls.user, shop=cls.shop, role=MembershipRole.OWNER)
+        # nomes repetidos: o desempate por id não pode pular nem repetir linhas
+        Cliente.objects.bulk_create(
+            Cliente(shop=cls.shop, nome=f"Cliente {i // 3:02d}") for i in range(CLIENTES_PAGE_SIZE + 10)
+        )
+        cls.url = reverse("clientes:lista", kwargs={"shop_slug": cls.shop.slug})
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.force_login(self.user)
+
+    def test_keyset_pages_cover_every_row_once(self):
+        vistos, query = [], ""
+        for _ in range(5):
+            resp = self.client.get(f"{self.url}?{query}")
+            self.assertEqual(resp.status_code, 200)
+            vistos += [c.pk for c in resp.context["clientes"]]
+            query = resp.context["next_query"]
+            if not query:
+                break
+        esperado = list(Cliente.objects.filter(shop=self.shop).order_by("nome", "id").values_list("pk", flat=True))
+        self.assertEqual(vistos, esperado)
+
+    def test_keyset_page_helper(self):
+        qs = Cliente.objects.filter(shop=self.shop)
+        rows, cursor = _keyset_page(qs, "", None, size=4)
+        self.assertEqual(len(rows), 4)
+        resto, _ = _keyset_page(qs, cursor["after_nome"], cursor["after_id"], size=4)
+        self.assertEqual(resto[0], qs.order_by("nome", "id")[4])
+
+    def _etag(self):
+        # a 1ª visita só planta o cookie CSRF (que entra no ETag); vale a partir da 2ª
+        self.client.get(self.url)
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        return resp["ETag"]
+
+    def test_unchanged_list_returns_304(self):
+        etag = self._etag()
+        self.assertEqual(self.client.get(self.url, headers={"if-none-match": etag}).status_code, 304)
+
+    def test_cliente_change_changes_etag(self):
+        etag = self._etag()
+        c = Cliente.objects.filter(shop=self.shop).first()
+        c.nome = "Renomeado"
+        c.save()
+        self.assertEqual(self.client.get(self.url, headers={"if-none-match": etag}).status_code, 200)
+
+    def test_historico_change_changes_etag(self):
+        c = Cliente.objects.filter(shop=self.shop).order_by("nome", "id").first()
+        with self.captureOnCommitCallbacks(execute=True):
+            item = HistoricoItem.objects.create(shop=self.shop, cliente=c, data=timezone.now(), servico="Corte")
+        etag = self._etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        resp = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["clientes"][0].historico_recente, [])
 
-# Create your tests here.
+    def test_filters_change_etag(self):
+        etag = self._etag()
+        resp = self.client.get(self.url, {"q": "Cliente 01"}, headers={"if-none-match": etag})
+        self.assertEqual(resp.status_code, 200)
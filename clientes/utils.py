@@ -0,0 +1,40 @@
+# clientes/utils.py
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+
+def historico_version_key(shop_id):
+    return f"hist_ver:{shop_id}"
+
+def historico_version(shop_id):
+    """
+    Versão do histórico da barbearia: entra nas chaves de cache dos gráficos do dashboard
+    e muda a cada gravação de HistoricoItem (os caches antigos simplesmente expiram).
+    Começa no timestamp atual para não colidir com versões de antes de uma eviction.
+    """
+    return cache.get_or_set(historico_version_key(shop_id), lambda: int(time.time()), None)
+
+def bump_historico_version(shop_id):
+    """Invalida os caches derivados do histórico da barbearia (após o commit)."""
+    def _do():
+        key = historico_version_key(shop_id)
+        try:
+            cache.incr(key)
+        except ValueError:  # chave sumiu (eviction/restart): recomeça numa versão nova
+            cache.set(key, int(time.time()), None)
+    transaction.on_commit(_do)
+
+def kpi_cache_key(shop_id, d):
+    """
+    Chave dos KPIs do mês (faturamento/ticket/clientes novos) no dashboard: inclui a versão
+    do histórico, então gravações de HistoricoItem já a trocam; clientes novos apagam a chave.
+    """
+    return f"kpi:{shop_id}:{d:%Y%m}:{historico_version(shop_id)}"
+
+def invalidate_kpis(shop_id, when):
+    """Apaga (após o commit) os KPIs em cache do mês de `when` (datetime)."""
+    d = timezone.localtime(when).date() if timezone.is_aware(when) else when.date()
+    transaction.on_commit(lambda: cache.delete(kpi_cache_key(shop_id, d)))
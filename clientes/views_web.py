@@ -1,36 +1,153 @@
+import hashlib
 from datetime import timedelta
+from functools import lru_cache
 from django.conf import settings
 from django.contrib import messages
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.core.signals import setting_changed
 from django.db import transaction
-from django.db.models import Q
-from django.shortcuts import get_object_or_404, redirect, render
+from django.db.models import Count, F, Max, Prefetch, Q, Value
+from django.db.models.functions import Coalesce, Greatest, NullIf
+from django.dispatch import receiver
+from django.http import Http404, HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
 from django.utils import timezone
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_POST
 
-from core.access import require_shop_member
-from barbearias.models import BarberShop
+from core.access import _wants_json, require_shop_member
 from .models import Cliente, HistoricoItem
 from .forms import ClienteForm, HistoricoItemForm
+from .utils import historico_version
 
 #-------- Helpers --------
+# O projeto não ativa fuso por request (timezone.activate), então o fuso corrente
+# é sempre o TIME_ZONE do settings: resolvido uma vez no import.
+_TZ = timezone.get_default_timezone()
+
+@receiver(setting_changed)
+def _rebind_tz(*, setting, **kwargs):
+    global _TZ
+    if setting == "TIME_ZONE":
+        timezone.get_default_timezone.cache_clear()
+        _TZ = timezone.get_default_timezone()
+
 def _now_tz():
-    return timezone.localtime(timezone.now(), timezone.get_current_timezone())
+    return timezone.localtime(timezone.now(), _TZ)
 
 def _inactive_cutoff(days=None):
     days = days or getattr(settings, "CLIENTE_INATIVO_DIAS", 60)
     return _now_tz() - timedelta(days=days)
 
-def _get_shop_or_404(shop_slug):
-    return get_object_or_404(BarberShop, slug=shop_slug)
+def _get_shop_or_404(request, shop_slug):
+    # toda view daqui passa por require_shop_member, que já resolveu a barbearia
+    # do shop_slug junto com a associação (sem associação ativa nem chega aqui)
+    return request.shop
+
+
+@lru_cache(maxsize=1)
+def _detalhe_url_template() -> str:
+    """Resolve a rota de detalhe uma única vez e devolve um template '.../{shop_slug}/.../{pk}/'."""
+    url = reverse("clientes:detalhe", kwargs={"shop_slug": "__shop__", "pk": 999999999})
+    return url.replace("__shop__", "{shop_slug}").replace("999999999", "{pk}")
+
+def _redirect_detalhe(shop, pk):
+    # chamado só após POST: 303 deixa explícito que o navegador deve seguir com GET
+    resp = HttpResponseRedirect(_detalhe_url_template().format(shop_slug=shop.slug, pk=pk))
+    resp.status_code = 303
+    return resp
+
+def _notify(request, level, text, **payload):
+    """
+    Mensagem para o usuário. Clientes JSON (AJAX/fetch) recebem a resposta pronta e
+    nada vai para o storage de messages (sem escrita de sessão/cookie); para HTML
+    registra a mensagem e retorna None, e a view segue com o redirect de sempre.
+    """
+    if _wants_json(request):
+        ok = level < messages.ERROR
+        return JsonResponse({"ok": ok, "message": text, **payload}, status=200 if ok else 400)
+    messages.add_message(request, level, text)
+    return None
+
+
+def _get_cliente_slim(shop, pk):
+    """Cliente só com as colunas que as ações rápidas tocam (sem tags/preferências)."""
+    c = (Cliente.objects.only("id", "shop", "ultimo_corte", "recorrencia_status")
+         .filter(pk=pk, shop=shop).first())
+    if c is None:
+        raise Http404("Cliente não encontrado.")
+    return c
+
+def _registrar_corte(cliente_pk, data=None):
+    """
+    Atualiza o cliente num único UPDATE após um atendimento: ultimo_corte só avança
+    (se houver data, ou seja, não foi falta) e a recorrência é recalculada no banco.
+    """
+    changes = {"updated_at": timezone.now()}
+    if data:
+        changes["ultimo_corte"] = Greatest(Coalesce(F("ultimo_corte"), Value(data)), Value(data))
+    changes["recorrencia_status"] = Cliente.recorrencia_case(ultimo_corte=changes.get("ultimo_corte"))
+    return Cliente.objects.filter(pk=cliente_pk).update(**changes)
+
+
+CLIENTES_PAGE_SIZE = 20
+
+def _keyset_page(qs, after_nome, after_id, size=CLIENTES_PAGE_SIZE):
+    """
+    Paginação por keyset em (nome, id): busca size+1 linhas após o cursor,
+    sem OFFSET nem COUNT(*). Retorna (linhas, cursor_da_proxima_pagina | None).
+    """
+    qs = qs.order_by("nome", "id")
+    if after_id is not None:
+        qs = qs.filter(Q(nome__gt=after_nome) | Q(nome=after_nome, id__gt=after_id))
+    rows = list(qs[: size + 1])
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        return rows, {"after_nome": last.nome, "after_id": last.pk}
+    return rows, None
+
+
+CLIENTES_COUNT_TTL = 60  # segundos
+
+def _cached_count(qs, shop, filters: dict) -> int:
+    """COUNT(*) da listagem filtrada, cacheado por barbearia + filtros por um curto período."""
+    raw = "|".join(f"{k}={filters[k]}" for k in sorted(filters))
+    key = f"clientes_count:{shop.pk}:{hashlib.md5(raw.encode()).hexdigest()}"
+    return cache.get_or_set(key, qs.count, CLIENTES_COUNT_TTL)
+
+
+def _clientes_list_etag(request, shop_slug):
+    """
+    ETag da listagem: muda quando algum cliente da barbearia é criado/alterado/removido,
+    quando o histórico muda (historico_recente de cada linha), quando os filtros/cursor
+    mudam, ou quando muda o dia (janela de inativos).
+    Sem ETag se houver mensagens pendentes, para não engoli-las num 304.
+    """
+    shop = getattr(request, "shop", None)
+    if shop is None or len(messages.get_messages(request)):
+        return None
+    agg = Cliente.objects.filter(shop=shop).aggregate(m=Max("updated_at"), n=Count("id"))
+    raw = "|".join(str(p) for p in (
+        shop.pk,
+        request.user.pk,
+        request.META.get("CSRF_COOKIE", ""),
+        agg["m"].timestamp() if agg["m"] else "",
+        agg["n"],
+        historico_version(shop.pk),
+        timezone.localdate(),
+        request.GET.urlencode(),
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
 
 
 # -------- Listagem --------
 @require_shop_member
+@condition(etag_func=_clientes_list_etag)
 def clientes_list(request, shop_slug):
-    shop = _get_shop_or_404(shop_slug)
+    shop = _get_shop_or_404(request, shop_slug)
 
-    qs = Cliente.objects.filter(shop=shop).order_by("nome")
+    qs = Cliente.objects.filter(shop=shop)
 
     q = (request.GET.get("q") or "").strip()
     status_ = (request.GET.get("status") or "").strip()  # "ATIVO" | "INATIVO" | ""
@@ -51,19 +168,47 @@ def clientes_list(request, shop_slug):
         cutoff = _inactive_cutoff(dias)
         qs = qs.filter(Q(ultimo_corte__lt=cutoff) | Q(ultimo_corte__isnull=True))
 
-    page = Paginator(qs, 20).get_page(request.GET.get("page"))
+    after_nome = request.GET.get("after_nome") or ""
+    try:
+        after_id = int(request.GET["after_id"])
+    except (KeyError, ValueError):
+        after_id = None
+    # último registro de histórico de cada cliente da página: 1 query extra em vez de N
+    recente = (HistoricoItem.objects.filter(shop=shop)
+               .only("cliente", "data", "servico", "servico_nome_cache", "faltou")
+               .order_by("-data")[:1])
+    qs = qs.prefetch_related(Prefetch("historico", queryset=recente, to_attr="historico_recente"))
+    clientes, next_cursor = _keyset_page(qs, after_nome, after_id)
+    filters = {
+        "q": q,
+        "status": status_,
+        "inativos": inativos_flag,
+        "dias": dias_param or "",
+    }
+    total = _cached_count(qs, shop, filters)
+
+    next_query = ""
+    if next_cursor:
+        params = request.GET.copy()
+        for key, value in next_cursor.items():
+            params[key] = value
+        next_query = params.urlencode()
+    first_query = ""
+    if after_id is not None:
+        params = request.GET.copy()
+        params.pop("after_nome", None)
+        params.pop("after_id", None)
+        first_query = params.urlencode()
 
     ctx = {
         "title": "Clientes",
         "shop": shop,
-        "clientes": page,
-        "page_obj": page,
-        "filters": {
-            "q": q,
-            "status": status_,
-            "inativos": inativos_flag,
-            "dias": dias_param or "",
-        },
+        "clientes": clientes,
+        "is_first_page": after_id is None,
+        "first_query": first_query,
+        "next_query": next_query,
+        "total": total,
+        "filters": filters,
     }
     return render(request, "clientes/clientes.html", ctx)
 
@@ -73,16 +218,16 @@ def clientes_list(request, shop_slug):
 @require_shop_member
 @transaction.atomic
 def cliente_new(request, shop_slug):
-    shop = _get_shop_or_404(shop_slug)
+    shop = _get_shop_or_404(request, shop_slug)
     if request.method == "POST":
         form = ClienteForm(request.POST)
         if form.is_valid():
             c = form.save(commit=False)
             c.shop = shop
+            c.refresh_recorrencia()  # status inicial calculado antes do INSERT
             c.save()
-            c.refresh_recorrencia(save=True)  # garante status inicial coerente
             messages.success(request, "Cliente criado.")
-            return redirect("clientes:detalhe", shop_slug=shop.slug, pk=c.pk)
+            return _redirect_detalhe(shop, c.pk)
     else:
         form = ClienteForm()
     return render(request, "clientes/cliente_form.html", {"form": form, "title": "Novo cliente", "shop": shop})
@@ -90,7 +235,7 @@ def cliente_new(request, shop_slug):
 @require_shop_member
 @transaction.atomic
 def cliente_edit(request, shop_slug, pk):
-    shop = _get_shop_or_404(shop_slug)
+    shop = _get_shop_or_404(request, shop_slug)
     c = get_object_or_404(Cliente, pk=pk, shop=shop)
     if request.method == "POST":
         form = ClienteForm(request.POST, instance=c)
@@ -98,7 +243,7 @@ def cliente_edit(request, shop_slug, pk):
             c = form.save()
             c.refresh_recorrencia(save=True)  # caso altere ultimo_corte manualmente
             messages.success(request, "Dados do cliente atualizados.")
-            return redirect("clientes:detalhe", shop_slug=shop.slug, pk=c.pk)
+            return _redirect_detalhe(shop, c.pk)
     else:
         form = ClienteForm(instance=c)
     return render(request, "clientes/cliente_form.html", {"form": form, "title": f"Editar · {c.nome}", "shop": shop})
@@ -108,10 +253,16 @@ def cliente_edit(request, shop_slug, pk):
 # -------- Detalhe + adicionar histórico --------
 @require_shop_member
 def cliente_detail(request, shop_slug, pk):
-    shop = _get_shop_or_404(shop_slug)
+    shop = _get_shop_or_404(request, shop_slug)
     c = get_object_or_404(Cliente, pk=pk, shop=shop)
 
-    hist = c.historico.filter(shop=shop).order_by("-data")[:20]  # requer HistoricoItem.shop
+    # só as colunas exibidas (cobertas pelo índice historicoitem_cliente_data_cov no Postgres)
+    hist = (c.historico.filter(shop=shop)  # requer HistoricoItem.shop
+            .order_by("-data")
+            .values(
+                "data", "valor", "faltou", "profissional",
+                servico_label=Coalesce(NullIf("servico_nome_cache", Value("")), "servico"),
+            )[:20])
     form_hist = HistoricoItemForm()
 
     cutoff = getattr(settings, "CLIENTE_INATIVO_DIAS", 60)
@@ -134,13 +285,13 @@ def cliente_detail(request, shop_slug, pk):
 @require_POST
 @transaction.atomic
 def cliente_add_historico(request, shop_slug, pk):
-    shop = _get_shop_or_404(shop_slug)
-    c = get_object_or_404(Cliente, pk=pk, shop=shop)
+    shop = _get_shop_or_404(request, shop_slug)
+    c = _get_cliente_slim(shop, pk)
 
     form = HistoricoItemForm(request.POST)
     if not form.is_valid():
-        messages.error(request, "Verifique os dados do histórico.")
-        return redirect("clientes:detalhe", shop_slug=shop.slug, pk=c.pk)
+        return (_notify(request, messages.ERROR, "Verifique os dados do histórico.", errors=form.errors.get_json_data())
+                or _redirect_detalhe(shop, c.pk))
 
     item = form.save(commit=False)
     item.cliente = c
@@ -150,21 +301,19 @@ def cliente_add_historico(request, shop_slug, pk):
         item.preco_tabela = getattr(item.servico_ref, "preco", None)
     item.save()
 
-    # atualiza cliente (se não foi falta)
-    if not item.faltou:
-        c.set_ultimo_corte(item.data, save=True)
-    c.refresh_recorrencia(save=True)
+    # atualiza cliente (último corte, se não foi falta, + recorrência) num único UPDATE
+    _registrar_corte(c.pk, None if item.faltou else item.data)
 
-    messages.success(request, "Histórico adicionado.")
-    return redirect("clientes:detalhe", shop_slug=shop.slug, pk=c.pk)
+    return (_notify(request, messages.SUCCESS, "Histórico adicionado.", cliente_id=c.pk, historico_id=item.pk)
+            or _redirect_detalhe(shop, c.pk))
 
 # -------- Ação rápida: registrar corte hoje --------
 @require_POST
 @require_shop_member
 @transaction.atomic
 def cliente_corte_hoje(request, shop_slug, pk):
-    shop = _get_shop_or_404(shop_slug)
-    c = get_object_or_404(Cliente, pk=pk, shop=shop)
+    shop = _get_shop_or_404(request, shop_slug)
+    c = _get_cliente_slim(shop, pk)
 
     servico_label = (request.POST.get("servico") or "Corte").strip()
     now = _now_tz()
@@ -177,8 +326,7 @@ def cliente_corte_hoje(request, shop_slug, pk):
         faltou=False,
     )
 
-    c.set_ultimo_corte(now, save=True)
-    c.refresh_recorrencia(save=True)
+    _registrar_corte(c.pk, now)
 
-    messages.success(request, "Corte de hoje registrado.")
-    return redirect("clientes:detalhe", shop_slug=shop.slug, pk=c.pk)
+    return (_notify(request, messages.SUCCESS, "Corte de hoje registrado.", cliente_id=c.pk)
+            or _redirect_detalhe(shop, c.pk))
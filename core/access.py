@@ -3,13 +3,16 @@ from __future__ import annotations
 from functools import wraps
 from typing import Callable, Optional
 from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import redirect
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages                      # ✅ CORRETO
 from django.contrib.auth.views import redirect_to_login
 from barbearias.models import BarberShop, Membership, MembershipRole
 
+# colunas de BarberShop usadas pelas views/templates (evita trazer api_key, instance etc.)
+SHOP_LIGHT_FIELDS = ("id", "owner", "nome", "slug", "timezone")
+
 def _wants_json(request: HttpRequest) -> bool:
     xrw = (request.headers.get("X-Requested-With") or "").lower()
     accept = (request.headers.get("Accept") or "").lower()
@@ -20,32 +23,44 @@ def get_membership(user, shop) -> Optional[Membership]:
         return None
     return Membership.objects.filter(user=user, shop=shop, is_active=True).first()
 
+def get_membership_by_slug(user, shop_slug: str) -> Optional[Membership]:
+    """Associação ativa do usuário + barbearia (pelo slug) num único SELECT com JOIN."""
+    if not (user and user.is_authenticated and shop_slug):
+        return None
+    return (Membership.objects
+            .select_related("shop")
+            .only("user", "shop", "role", "is_active", *(f"shop__{f}" for f in SHOP_LIGHT_FIELDS))
+            .filter(shop__slug=shop_slug, user=user, is_active=True)
+            .first())
+
 def get_shop_for_user(request: HttpRequest, shop_slug: str) -> BarberShop:
-    shop = get_object_or_404(BarberShop, slug=shop_slug)
-    mem = get_membership(request.user, shop)
+    mem = getattr(request, "membership", None)
+    if mem is None or mem.shop.slug != shop_slug:
+        mem = get_membership_by_slug(request.user, shop_slug)
     if not mem:
         raise Http404("Barbearia não encontrada.")
-    request.shop = shop
+    request.shop = mem.shop
     request.membership = mem
-    return shop
+    return mem.shop
 
 def is_manager(request: HttpRequest) -> bool:
     mem = getattr(request, "membership", None)
     return bool(mem and mem.role in (MembershipRole.OWNER, MembershipRole.MANAGER))
 
 def require_shop_member(view: Callable) -> Callable:
-    """Confere login + associação à barbearia do shop_slug; injeta request.shop."""
+    """Confere login + associação à barbearia do shop_slug; injeta request.shop e request.membership."""
     @wraps(view)
     def _wrapped(request: HttpRequest, shop_slug: str, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect_to_login(request.get_full_path())
-        shop = get_object_or_404(BarberShop, slug=shop_slug)
-        # checa associação
-        if not Membership.objects.filter(shop=shop, user=request.user, is_active=True).exists():
+        # barbearia + associação em um único SELECT (JOIN)
+        mem = get_membership_by_slug(request.user, shop_slug)
+        if mem is None:
             if _wants_json(request):
                 return JsonResponse({"ok": False, "error": "forbidden"}, status=403)
             messages.error(request, "Sem acesso a esta barbearia.")
             return redirect("painel:dashboard")
-        request.shop = shop
+        request.shop = mem.shop
+        request.membership = mem
         return view(request, shop_slug, *args, **kwargs)
     return _wrapped
@@ -1,15 +1,24 @@
 # core/contacts.py
 from __future__ import annotations
-import re
 from typing import Optional
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Right
+from django.utils import timezone
 from clientes.models import Cliente
 from barbearias.models import BarberShop
 
-_NON_DIGITS = re.compile(r"\D+")
+# prioridades dos critérios de match em find_or_create_cliente
+_MATCH_EXATO, _MATCH_SUFIXO, _MATCH_NOME = 0, 1, 2
+
+# tabela de tradução montada uma vez: apaga todo caractere Latin-1 que não seja 0-9
+_KEEP_DIGITS = str.maketrans("", "", "".join(chr(c) for c in range(256) if not 48 <= c <= 57))
 
 def _only_digits(raw: Optional[str]) -> str:
-    return _NON_DIGITS.sub("", raw or "")
+    digits = (raw or "").translate(_KEEP_DIGITS)
+    if not digits.isascii():  # sobrou algo fora do Latin-1 (raro): filtra caractere a caractere
+        digits = "".join(ch for ch in digits if "0" <= ch <= "9")
+    return digits
 
 def normalize_msisdn_br(raw: Optional[str]) -> Optional[str]:
     """
@@ -21,27 +30,27 @@ def normalize_msisdn_br(raw: Optional[str]) -> Optional[str]:
     """
     if not raw:
         return None
+    # caminho rápido: já está no formato final (55 + DDD sem zero + número, só dígitos ASCII)
+    if len(raw) in (12, 13) and raw.startswith("55") and raw[2] != "0" and raw.isascii() and raw.isdigit():
+        return raw
     digits = _only_digits(raw)
 
     # remove prefixo discado internacional "00"
     if digits.startswith("00"):
         digits = digits[2:]
 
-    # se veio sem 55 e parece DDD+numero (10 ou 11), prefixa 55
-    if not digits.startswith("55") and len(digits) in (10, 11):
-        digits = "55" + digits
-
-    # casos "550..." (DDI 55 + zero extra do tronco): 550X... -> 55X...
-    if digits.startswith("550"):
-        digits = "55" + digits[3:]
-
-    # remover zeros à esquerda APÓS o 55 (nunca remova o 55)
     if digits.startswith("55"):
-        resto = digits[2:].lstrip("0")
-        digits = "55" + resto
+        resto = digits[2:]
+    elif len(digits) in (10, 11):  # sem 55 mas parece DDD+numero: prefixa 55
+        resto = digits
+    else:
+        return None
 
-    # validar tamanho final BR: 55 + DDD(2) + número(8 ou 9) => 12 ou 13 dígitos
-    if not (digits.startswith("55") and len(digits) in (12, 13) and digits.isdigit()):
+    # zeros à esquerda APÓS o 55 (inclui o "550X..." do zero de tronco); nunca remove o 55
+    digits = "55" + resto.lstrip("0")
+
+    # tamanho final BR: 55 + DDD(2) + número(8 ou 9) => 12 ou 13 dígitos (já são só dígitos)
+    if len(digits) not in (12, 13):
         return None
 
     return digits
@@ -65,62 +74,77 @@ def find_or_create_cliente(
     2) Tenta match EXATO por telefone (seguro).
     3) Tenta match por SUFIXO (últimos 8 dígitos) para dados antigos (tolerante).
        - Se achar por sufixo, atualiza o telefone do cliente para o normalizado.
-    4) Se não achar, cria.
+    4) Tenta match por nome + últimos 4 dígitos do telefone.
+    5) Se não achar, cria.
+    Os passos 2-4 saem numa única consulta, ordenada pela prioridade do critério.
     """
     tel_norm = normalize_msisdn_br(telefone)
     nome = (nome or "").strip()
 
-    qs = Cliente.objects.filter(shop=shop)
-
-    # 1) match forte por telefone normalizado
+    # 1-3 numa única consulta: cada critério vira um ramo do OR e uma prioridade
+    # no CASE; fica com o match de maior prioridade (menor número).
+    match = Q()
+    whens = []
     if tel_norm:
-        c = qs.filter(telefone=tel_norm).first()
-        if c:
-            # Atualiza nome se estiver vazio e recebemos nome
-            if not c.nome and nome:
-                c.nome = nome
-                c.save(update_fields=["nome"])
-            return c
-
-    # 2) match tolerante por sufixo (últimos 8 dígitos),
-    #    útil para bases antigas sem DDI/DDD uniformes
-    if tel_norm:
-        suf8 = tel_norm[-8:]
-        c = qs.filter(telefone__isnull=False, telefone__regex=r"\d{8,}", telefone__endswith=suf8).first()
-        if c:
-            # Se o telefone salvo for diferente do normalizado, atualiza para o padrão
-            if c.telefone != tel_norm:
-                c.telefone = tel_norm
-                # Atualiza nome se faltando
-                if not c.nome and nome:
-                    c.nome = nome
-                    c.save(update_fields=["telefone", "nome"])
-                else:
-                    c.save(update_fields=["telefone"])
-            else:
-                if not c.nome and nome:
-                    c.nome = nome
-                    c.save(update_fields=["nome"])
-            return c
-
-    # 3) match leve por nome + “rastro” de telefone (últimos 4),
-    #    só se recebemos nome
+        # 1) match forte por telefone normalizado
+        exato = Q(telefone=tel_norm)
+        # 2) match tolerante por sufixo (últimos 8 dígitos), útil para bases antigas
+        #    sem DDI/DDD uniformes; mesma expressão do índice clientes_tel_suffix8_idx
+        sufixo = Q(_suf8=tel_norm[-8:])
+        match |= exato | sufixo
+        whens += [When(exato, then=Value(_MATCH_EXATO)), When(sufixo, then=Value(_MATCH_SUFIXO))]
     if nome:
-        probe = qs.filter(nome__iexact=nome)
+        # 3) match leve por nome + “rastro” de telefone (últimos 4)
+        rastro = Q(nome__iexact=nome)
         if tel_norm:
             suf4 = tel_norm[-4:]
-            probe = probe.filter(Q(telefone__endswith=suf4) | Q(telefone__icontains=suf4))
-        c = probe.first()
-        if c:
-            # Preenche telefone normalizado se estiver vazio ou diferente
-            if tel_norm and c.telefone != tel_norm:
-                c.telefone = tel_norm
-                c.save(update_fields=["telefone"])
-            return c
+            rastro &= Q(telefone__endswith=suf4)
+        match |= rastro
+        whens.append(When(rastro, then=Value(_MATCH_NOME)))
+
+    c = None
+    if whens:
+        c = (Cliente.objects.filter(shop=shop)
+             .alias(_suf8=Right("telefone", 8))
+             .filter(match)
+             .annotate(_p=Case(*whens, output_field=IntegerField()))
+             .order_by("_p", "nome", "pk")
+             .only("id", "shop", "nome", "telefone")
+             .first())
+
+    if c is not None:
+        # completa o cadastro com um único UPDATE (sem save()/sinais); só se algo mudou
+        changes = {}
+        # Atualiza nome se estiver vazio e recebemos nome (match por telefone)
+        if c._p != _MATCH_NOME and not c.nome and nome:
+            changes["nome"] = nome
+        # Telefone salvo diferente do normalizado (match por sufixo ou nome): atualiza para o padrão
+        if c._p != _MATCH_EXATO and tel_norm and c.telefone != tel_norm:
+            changes["telefone"] = tel_norm
+        if changes:
+            alvo = Cliente.objects.filter(pk=c.pk)
+            if "nome" in changes:
+                # só preenche se continuar vazio no banco (não sobrescreve nome gravado em paralelo)
+                alvo = alvo.filter(nome="")
+            # update() devolve as linhas afetadas: 0 => nada mudou, não espelha no objeto
+            if alvo.update(updated_at=timezone.now(), **changes):
+                for field, value in changes.items():
+                    setattr(c, field, value)
+        return c
 
     # 4) criar novo
-    return Cliente.objects.create(
+    novo = dict(
         shop=shop,
         nome=nome or (tel_norm or "Cliente"),
         telefone=tel_norm or None,  # nunca converta telefone para int
-    )
\ No newline at end of file
+    )
+    if not tel_norm:
+        return Cliente.objects.create(**novo)
+    # Mesmo esquema do get_or_create, sem repetir o SELECT que já fizemos acima: dois
+    # intakes simultâneos do mesmo número esbarram em uniq_cliente_por_shop_telefone
+    # e o perdedor fica com a linha criada pelo outro.
+    try:
+        with transaction.atomic():
+            return Cliente.objects.create(**novo)
+    except IntegrityError:
+        return Cliente.objects.get(shop=shop, telefone=tel_norm)
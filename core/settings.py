@@ -1,10 +1,14 @@
 # core/settings.py
+import logging
 import os
 from pathlib import Path
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-load_dotenv(BASE_DIR / ".env")  # carrega variáveis do .env
+# carrega variáveis do .env; onde o ambiente já vem injetado (systemd, orquestrador),
+# defina DJANGO_LOAD_DOTENV=0 para pular a leitura/parse do arquivo no boot de cada worker
+if os.getenv("DJANGO_LOAD_DOTENV", "1") == "1":
+    load_dotenv(BASE_DIR / ".env")
 
 # =========================
 # Segurança / Debug
@@ -12,12 +16,6 @@ load_dotenv(BASE_DIR / ".env")  # carrega variáveis do .env
 SECRET_KEY = os.getenv("SECRET_KEY", "troque-esta-chave")
 DEBUG = os.getenv("DEBUG", "1") == "1"
 
-# Ajuste conforme seu ambiente (Docker, localhost etc.)
-import socket
-POSTGRES_HOST = os.getenv("POSTGRES_HOST", "db")
-if socket.gethostname() == "seu-host":  # rodando fora do docker
-    POSTGRES_HOST = "127.0.0.1"
-
 # Em Docker, você acessa por 0.0.0.0:8000; mantenha localhost/127.0.0.1 também
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1,0.0.0.0").split(",")
 
@@ -76,6 +74,8 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # barbearia ativa + papel + pendentes do painel, resolvidos uma vez por request
+    "painel.middleware.DashboardContextMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -119,7 +119,8 @@ def _env(*keys, default=None):
 DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
 
 if DB_ENGINE == "postgres":
-    # ⚠️ Fora do Docker, o padrão deve ser 127.0.0.1
+    # ⚠️ Fora do Docker, o padrão deve ser 127.0.0.1; no Docker o compose/.env
+    # define POSTGRES_HOST=db (decisão só por variável de ambiente, sem olhar hostname)
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.postgresql",
@@ -128,6 +129,12 @@ if DB_ENGINE == "postgres":
             "PASSWORD": os.getenv("POSTGRES_PASSWORD", "secret"),
             "HOST": os.getenv("POSTGRES_HOST", "127.0.0.1"),
             "PORT": os.getenv("POSTGRES_PORT", "5432"),
+            # reaproveita a conexão entre requests (checando se ainda vive antes de usar)
+            "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {"connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "5"))},
+            # atrás de pgbouncer em modo transaction, exporte DB_DISABLE_SERVER_SIDE_CURSORS=1
+            "DISABLE_SERVER_SIDE_CURSORS": os.getenv("DB_DISABLE_SERVER_SIDE_CURSORS", "0") == "1",
         }
     }
 else:
@@ -139,6 +146,34 @@ else:
     }
 
 
+# =========================
+# Cache (Redis se REDIS_URL estiver definido; senão memória local do processo)
+# =========================
+REDIS_URL = os.getenv("REDIS_URL", "")
+if REDIS_URL:
+    # requer o pacote `redis` (requirements.txt)
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    # LocMem é por processo: com vários workers (gunicorn), a invalidação por sinais
+    # (membership/gerente, pendentes, disponibilidade, barbearia) só limpa o worker que
+    # gravou e os outros servem o valor antigo até o TTL. Em produção, defina REDIS_URL.
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+    if not DEBUG:
+        logging.getLogger(__name__).warning(
+            "REDIS_URL não definido: cache em memória local (LocMemCache) com DEBUG desligado; "
+            "invalidações de cache não são vistas pelos outros workers."
+        )
+
+
 # =========================
 # Senhas
 # =========================
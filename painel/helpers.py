@@ -0,0 +1,116 @@
+# painel/helpers.py
+"""
+Helpers comuns às views do painel (views.py), aos dashboards (views_dashboard.py) e ao
+DashboardContextMiddleware: introspecção de modelos (com lru_cache, compartilhado pelos
+módulos), filtro por barbearia, janela do dia e o contexto por request (barbearia ativa,
+papel de gerente, pendentes).
+"""
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+
+from barbearias.utils import MANAGER_CACHE_TTL, get_session_shop, manager_cache_key
+
+try:
+    from solicitacoes.utils import pending_count_cached
+except Exception:
+    pending_count_cached = None
+
+ONE_DAY = timedelta(days=1)
+
+
+@lru_cache(maxsize=None)
+def model_has_field(model, field_name: str) -> bool:
+    try:
+        model._meta.get_field(field_name)
+        return True
+    except FieldDoesNotExist:
+        return False
+
+
+@lru_cache(maxsize=None)
+def shop_field_for(model):
+    """Nome do campo que liga o modelo à barbearia (ou None); resolvido uma vez por modelo."""
+    for name in ("shop", "barbearia", "barber_shop"):
+        if model_has_field(model, name):
+            return name
+    return None
+
+
+def fk_fields_for(model, names: tuple) -> tuple:
+    """Dentre `names`, os campos FK/OneToOne do modelo (para select_related)."""
+    out = []
+    for name in names:
+        try:
+            f = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if getattr(f, "is_relation", False) and (getattr(f, "many_to_one", False) or getattr(f, "one_to_one", False)):
+            out.append(name)
+    return tuple(out)
+
+
+def apply_shop_filter(qs, shop):
+    """Filtra QuerySet pela barbearia informada, se o modelo tiver campo."""
+    # `qs is None` (e não `not qs`): bool() de um QuerySet executaria a consulta inteira
+    if not shop or qs is None:
+        return qs
+    name = shop_field_for(qs.model)
+    return qs.filter(**{name: shop}) if name else qs
+
+
+def today_window(d: date):
+    """Janela [start, end) do dia em timezone local."""
+    # zoneinfo: tzinfo direto no combine equivale ao make_aware, sem a volta extra
+    start = datetime.combine(d, time.min, tzinfo=timezone.get_current_timezone())
+    return start, start + ONE_DAY
+
+
+_MISSING = object()
+
+
+def resolve_default_shop(request):
+    """
+    Barbearia ativa do usuário (sessão ou, em sessão nova, get_default_shop_for),
+    resolvida no máximo uma vez por request e lida do cache por id; None se não houver.
+    """
+    shop = getattr(request, "_cached_default_shop", _MISSING)
+    if shop is _MISSING:
+        shop = request._cached_default_shop = get_session_shop(request)
+    return shop
+
+
+def user_is_manager(user, shop):
+    """
+    Retorna True se o usuário for OWNER ou MANAGER da barbearia.
+    Resultado em cache por (usuário, barbearia) por MANAGER_CACHE_TTL; os sinais de
+    Membership invalidam a chave.
+    """
+    if not (user.is_authenticated and shop):
+        return False
+    # memo no próprio user (vive o request): chamadas repetidas nem vão ao cache
+    memo = user.__dict__.setdefault("_is_manager_for_request", {})
+    val = memo.get(shop.id)
+    if val is None:
+        key = manager_cache_key(user.id, shop.id)
+        val = cache.get(key)
+        if val is None:
+            val = user.memberships.filter(shop=shop, role__in=["OWNER", "MANAGER"], is_active=True).exists()
+            cache.set(key, val, MANAGER_CACHE_TTL)
+        memo[shop.id] = val
+    return val
+
+
+def pending_count(request, shop):
+    """
+    Solicitações PENDENTE da barbearia (badge do menu), calculado no máximo uma vez por
+    request; entre requests vem do cache de solicitacoes.utils (invalidado pelos sinais).
+    """
+    v = getattr(request, "_pending_count", None)
+    if v is None:
+        v = pending_count_cached(shop.id) if (shop and pending_count_cached) else 0
+        request._pending_count = v
+    return v
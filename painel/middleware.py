@@ -0,0 +1,37 @@
+# painel/middleware.py
+from django.utils.functional import SimpleLazyObject
+
+from painel.helpers import pending_count, resolve_default_shop, user_is_manager
+
+
+class DashboardContextMiddleware:
+    """
+    Resolve uma vez por request o contexto comum das views do painel:
+      - request.painel_shop: barbearia ativa do usuário (sessão/cache)
+      - request.is_manager: OWNER/MANAGER dessa barbearia
+      - request.pending_count: solicitações PENDENTE (badge do menu)
+    Só age nas rotas do namespace "painel": admin, clientes, API etc. não pagam nada.
+    `painel_shop` e não `shop`: request.shop é o da URL (ShopSlugMiddleware) e outras
+    views dependem dele. Papel e pendentes são preguiçosos: só consultam se a
+    view/template de fato ler.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        if match is None or match.namespace != "painel":
+            return None
+        if request.user.is_authenticated:
+            shop = request.painel_shop = resolve_default_shop(request)
+            request.is_manager = SimpleLazyObject(lambda: user_is_manager(request.user, shop))
+            request.pending_count = SimpleLazyObject(lambda: pending_count(request, shop))
+        else:
+            request.painel_shop = None
+            request.is_manager = False
+            request.pending_count = 0
+        return None
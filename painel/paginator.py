@@ -0,0 +1,119 @@
+# painel/paginator.py
+import json
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# abaixo disso o COUNT(*) exato é barato o bastante
+ESTIMATE_THRESHOLD = 10_000
+COUNT_CACHE_TTL = 45  # segundos
+
+
+class EstimatedPaginator(Paginator):
+    """
+    Paginator que, no PostgreSQL, troca o COUNT(*) exato por estimativa do planner
+    quando a tabela é grande (pg_class.reltuples > ESTIMATE_THRESHOLD).
+
+    - reltuples só diz o tamanho da tabela inteira; como a listagem é filtrada
+      (shop/status/escopo do barbeiro), a estimativa usada é a do EXPLAIN da própria
+      consulta ("Plan Rows"), que respeita os filtros sem executar nada.
+    - estimate=False (ex.: busca textual, em que o planner erra muito) ou
+      SQLite/outros bancos: COUNT exato, como o Paginator padrão.
+    - o Paginator corta a última página em self.count: com total estimado, pedir a
+      última página (ou uma além dela) troca a estimativa pelo COUNT exato, para que
+      as linhas além da estimativa não sumam nem sobrem páginas vazias no fim.
+    """
+
+    def __init__(self, object_list, per_page, *args, estimate: bool = True, **kwargs):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        self.estimate = estimate
+        self.count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if self.estimate and hasattr(qs, "query"):
+            conn = connections[qs.db]
+            if conn.vendor == "postgresql":
+                est = self._estimated_count(qs, conn)
+                if est is not None:
+                    self.count_is_estimate = True
+                    return est
+        return super().count
+
+    def page(self, number):
+        try:
+            last = self.validate_number(number) >= self.num_pages
+        except EmptyPage:  # além do total estimado: pode existir de verdade
+            last = True
+        if last and self.count_is_estimate:
+            self._use_exact_count()
+        return super().page(number)
+
+    def get_page(self, number):
+        # o get_page do Django valida o número contra o total estimado antes de chamar
+        # page(): página além da estimativa cairia na "última" estimada
+        try:
+            return self.page(number)
+        except PageNotAnInteger:
+            return self.page(1)
+        except EmptyPage:
+            return self.page(self.num_pages)
+
+    def _use_exact_count(self):
+        self.__dict__["count"] = Paginator.count.func(self)
+        self.__dict__.pop("num_pages", None)
+        self.count_is_estimate = False
+
+    @staticmethod
+    def _estimated_count(qs, conn):
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [qs.model._meta.db_table],
+            )
+            row = cur.fetchone()
+            if not row or row[0] <= ESTIMATE_THRESHOLD:
+                return None
+            # ORDER BY não muda a contagem e só encarece o plano
+            sql, params = qs.order_by().query.sql_with_params()
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        rows = int(plan[0]["Plan"]["Plan Rows"])
+        # estimativa pequena não é confiável: deixa o COUNT exato decidir
+        return rows if rows > ESTIMATE_THRESHOLD else None
+
+
+class CachedCountPaginator(EstimatedPaginator):
+    """
+    EstimatedPaginator cujo total fica no cache por COUNT_CACHE_TTL sob `count_key`
+    (que precisa identificar a listagem: barbearia, filtros e escopo do usuário).
+    Total vindo do cache é tratado como estimativa (pode estar defasado): a última
+    página recalcula o COUNT exato e regrava o cache.
+    Sem `count_key`, comporta-se como o EstimatedPaginator.
+    """
+
+    def __init__(self, object_list, per_page, *args, count_key=None, **kwargs):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        if not self.count_key:
+            return super().count
+        total = cache.get(self.count_key)
+        if total is None:
+            total = super().count
+            cache.set(self.count_key, total, COUNT_CACHE_TTL)
+        else:
+            self.count_is_estimate = True
+        return total
+
+    def _use_exact_count(self):
+        super()._use_exact_count()
+        if self.count_key:
+            cache.set(self.count_key, self.count, COUNT_CACHE_TTL)
@@ -1,3 +1,226 @@
+from datetime import date, time as dt_time, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from agendamentos.models import Agendamento, BarberAvailability, BarberTimeOff, StatusAgendamento
+from barbearias.models import BarberShop
+from painel.helpers import today_window
+from painel.paginator import CachedCountPaginator, EstimatedPaginator
+from painel.views_dashboard import (
+    DEFAULT_SLOT_MIN,
+    WORKDAY_END_H,
+    WORKDAY_START_H,
+    _at,
+    _busy_qs,
+    _day_intervals,
+    _timeline_for_day,
+    _work_minutes_for_user_on_day,
+)
+from servicos.models import Servico
+from solicitacoes.models import Solicitacao, SolicitacaoStatus
+
+
+class EstimatedPaginatorTests(TestCase):
+    """Total estimado (EXPLAIN) não pode esconder nem inventar linhas no fim da lista."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        User.objects.bulk_create(User(username=f"u{i:03d}") for i in range(95))
+
+    def _paginator(self, estimate):
+        qs = get_user_model().objects.order_by("username")
+        pg = EstimatedPaginator(qs, 20)
+        conn = mock.MagicMock(vendor="postgresql")
+        patches = [
+            mock.patch("painel.paginator.connections", {qs.db: conn}),
+            mock.patch.object(EstimatedPaginator, "_estimated_count", return_value=estimate),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        return pg
+
+    def test_middle_page_keeps_estimate(self):
+        pg = self._paginator(300)
+        page = pg.get_page(2)
+        self.assertEqual(len(page), 20)
+        self.assertTrue(pg.count_is_estimate)
+        self.assertEqual(pg.count, 300)
+
+    def test_estimate_too_low_last_page_is_not_cut(self):
+        pg = self._paginator(50)
+        page = pg.get_page(3)  # última página pela estimativa
+        self.assertEqual(len(page), 20)
+        self.assertTrue(page.has_next())
+        self.assertEqual(pg.count, 95)
+
+    def test_page_beyond_low_estimate_is_served(self):
+        pg = self._paginator(50)
+        page = pg.get_page(5)
+        self.assertEqual(page.number, 5)
+        self.assertEqual([u.username for u in page][-1], "u094")
+        self.assertFalse(page.has_next())
+
+    def test_estimate_too_high_falls_back_to_real_last_page(self):
+        pg = self._paginator(300)
+        page = pg.get_page(15)
+        self.assertEqual(page.number, 5)
+        self.assertEqual(len(page), 15)
+        self.assertFalse(pg.count_is_estimate)
+
+    def test_invalid_page_number(self):
+        pg = self._paginator(50)
+        self.assertEqual(pg.get_page("x").number, 1)
+
+
+class CachedCountPaginatorTests(TestCase):
+    """Total em cache pode estar velho: a última página não pode cortar linhas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        User.objects.bulk_create(User(username=f"u{i:03d}") for i in range(45))
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _paginator(self):
+        return CachedCountPaginator(get_user_model().objects.order_by("username"), 20, count_key="cnt:test")
+
+    def test_miss_caches_exact_count(self):
+        pg = self._paginator()
+        self.assertEqual(pg.count, 45)
+        self.assertFalse(pg.count_is_estimate)
+        self.assertEqual(cache.get("cnt:test"), 45)
+
+    def test_stale_cached_count_does_not_cut_last_page(self):
+        cache.set("cnt:test", 30)  # total de antes de novas linhas chegarem
+        pg = self._paginator()
+        page = pg.get_page(2)
+        self.assertEqual(len(page), 20)
+        self.assertTrue(page.has_next())
+        self.assertEqual(cache.get("cnt:test"), 45)
+
+    def test_stale_cached_count_too_high_has_no_empty_page(self):
+        cache.set("cnt:test", 200)
+        page = self._paginator().get_page(10)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 5)
+
+
+class DashboardIntervalsTests(TestCase):
+    """_day_intervals/_busy_qs: UNION ALL de agendamentos + solicitações com o fim efetivo do banco."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = BarberShop.objects.create(nome="Barbearia Teste", slug="barbearia-teste")
+        cls.outra = BarberShop.objects.create(nome="Outra", slug="outra")
+        cls.barba = Servico.objects.create(nome="Barba teste", duracao_min=45)
+        cls.dia = date(2026, 10, 14)
+        at = lambda hh, mm=0: _at(cls.dia, hh, mm)  # noqa: E731
+        # bulk_create: sem save()/sinais, o fim fica nulo e sai do banco (_fim_expr)
+        Agendamento.objects.bulk_create([
+            Agendamento(shop=cls.shop, cliente_nome="Ana", servico_nome="Corte",
+                        inicio=at(9), fim=at(9, 40)),
+            Agendamento(shop=cls.shop, cliente_nome="Bia", servico=cls.barba, inicio=at(11)),
+            Agendamento(shop=cls.shop, cliente_nome="Cancelado", inicio=at(10),
+                        status=StatusAgendamento.CANCELADO),
+            Agendamento(shop=cls.outra, cliente_nome="Outra loja", inicio=at(9)),
+        ])
+        Solicitacao.objects.bulk_create([
+            Solicitacao(shop=cls.shop, nome="Caio", servico_nome="Corte", inicio=at(10)),
+            Solicitacao(shop=cls.shop, nome="Negada", inicio=at(14), status=SolicitacaoStatus.NEGADA),
+            Solicitacao(shop=cls.shop, nome="Outro dia", inicio=at(9) + timedelta(days=1)),
+        ])
+
+    def _window(self):
+        return today_window(self.dia)
+
+    def test_day_intervals_split_by_kind(self):
+        ag, sol = _day_intervals(self.shop, *self._window())
+        self.assertEqual([row.cli_nome for _, _, row in ag], ["Ana", "Bia"])
+        self.assertEqual([(i.hour, i.minute, f.hour, f.minute) for i, f, _ in ag], [(9, 0, 9, 40), (11, 0, 11, 45)])
+        self.assertEqual(len(sol), 1)
+        ini, fim, row = sol[0]
+        # sem fim e sem serviço: slot padrão
+        self.assertEqual((ini.hour, fim - ini), (10, timedelta(minutes=DEFAULT_SLOT_MIN)))
+        self.assertEqual((row.cli_nome, row.servico_nome, row.kind), ("", "Corte", "sol"))
+
+    def test_day_intervals_are_local_time(self):
+        ag, _ = _day_intervals(self.shop, *self._window())
+        self.assertTrue(all(i.tzinfo is not None and i.utcoffset() == _at(self.dia).utcoffset() for i, _, _ in ag))
+
+    def test_busy_qs_matches_intervals(self):
+        start, end = self._window()
+        busy = sorted(
+            (timezone.localtime(i).time(), timezone.localtime(f).time()) for i, f in _busy_qs(self.shop, start, end)
+        )
+        self.assertEqual(busy, [
+            (dt_time(9), dt_time(9, 40)), (dt_time(10), dt_time(10, 30)), (dt_time(11), dt_time(11, 45)),
+        ])
+
+    def test_timeline_marks_start_and_busy_slots(self):
+        tl = _timeline_for_day(self.shop, self.dia)
+        by_label = dict(zip(tl["labels"], tl["items"]))
+        self.assertEqual(by_label["09:00"]["kind"], "agendamento")
+        self.assertEqual(by_label["09:30"]["kind"], "ocupado")
+        self.assertEqual(by_label["10:00"]["kind"], "solicitacao")
+        self.assertEqual(by_label["11:30"]["kind"], "ocupado")
+        self.assertEqual(by_label["12:00"]["kind"], "livre")
+        self.assertEqual(by_label["14:00"]["kind"], "livre")  # negada não ocupa
+
+
+class WorkMinutesTests(TestCase):
+    """_work_minutes_for_user_on_day: expediente das regras menos as folgas (unidas) do dia."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.barbeiro = get_user_model().objects.create_user("barbeiro")
+        cls.dia = date(2026, 10, 14)
+        BarberAvailability.objects.create(
+            barbeiro=cls.barbeiro, weekday=cls.dia.weekday(), start_time=dt_time(9), end_time=dt_time(18),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _folga(self, h0, h1, dia=None):
+        d = dia or self.dia
+        BarberTimeOff.objects.create(barbeiro=self.barbeiro, start=_at(d, h0), end=_at(d, h1))
+
+    def test_rules_without_time_off(self):
+        self.assertEqual(_work_minutes_for_user_on_day(self.barbeiro, self.dia, 0), 9 * 60)
+
+    def test_time_off_is_subtracted(self):
+        self._folga(12, 13)
+        self.assertEqual(_work_minutes_for_user_on_day(self.barbeiro, self.dia, 0), 8 * 60)
+
+    def test_overlapping_time_offs_count_once(self):
+        self._folga(10, 12)
+        self._folga(11, 13)
+        self._folga(11, 12)
+        self.assertEqual(_work_minutes_for_user_on_day(self.barbeiro, self.dia, 0), 6 * 60)
+
+    def test_time_off_clamped_to_work_window(self):
+        self._folga(7, 10)
+        self._folga(17, 22)
+        self._folga(10, 12, dia=self.dia + timedelta(days=1))  # outro dia: não conta
+        self.assertEqual(_work_minutes_for_user_on_day(self.barbeiro, self.dia, 0), 7 * 60)
+
+    def test_whole_day_off(self):
+        self._folga(0, 23)
+        self.assertEqual(_work_minutes_for_user_on_day(self.barbeiro, self.dia, 0), 0)
 
-# Create your tests here.
+    def test_without_rules_uses_fallback(self):
+        outro_dia = self.dia + timedelta(days=1)
+        padrao = (WORKDAY_END_H - WORKDAY_START_H) * 60
+        self.assertEqual(_work_minutes_for_user_on_day(self.barbeiro, outro_dia, 0), padrao)
+        self.assertEqual(_work_minutes_for_user_on_day(AnonymousUser(), self.dia, 90), 90)
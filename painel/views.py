@@ -1,15 +1,18 @@
 # painel/views.py
-from datetime import date, datetime, timedelta
+import hashlib
 
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.db.models import Q
-from django.shortcuts import get_object_or_404, render, redirect
+from django.http import Http404
+from django.shortcuts import render, redirect
 from django.utils import timezone
 
 from agendamentos.models import StatusAgendamento
 from barbearias.models import BarberShop
-from barbearias.utils import get_default_shop_for
+from barbearias.utils import get_shop_by_slug_cached
+from painel.helpers import apply_shop_filter, fk_fields_for, today_window
+from painel.paginator import CachedCountPaginator
 from painel.visibility import is_shop_admin, scope_agendamentos_qs, scope_solicitacoes_qs
 
 # =========================
@@ -17,9 +20,11 @@ from painel.visibility import is_shop_admin, scope_agendamentos_qs, scope_solici
 # =========================
 try:
     from solicitacoes.models import Solicitacao, SolicitacaoStatus
+    from solicitacoes.utils import solicitacoes_version
 except Exception:
     Solicitacao = None
     SolicitacaoStatus = None
+    solicitacoes_version = None
 
 try:
     from clientes.models import Cliente  # HistoricoItem não é necessário aqui
@@ -39,61 +44,22 @@ HAS_SOL = Solicitacao is not None
 HAS_CLIENTE = Cliente is not None
 HAS_AG = Agendamento is not None
 
+# página vazia reaproveitada quando não há barbearia/solicitações (sem QuerySet nem COUNT)
+_EMPTY_PAGE = Paginator([], 20).get_page(1)
+
 
 # =========================
 # Helpers
 # =========================
-def _model_has_field(model, field_name: str) -> bool:
-    try:
-        model._meta.get_field(field_name)
-        return True
-    except Exception:
-        return False
-
-
-def _apply_shop_filter(qs, shop):
-    """Filtra QuerySet pela barbearia informada, se o modelo tiver campo."""
-    if not shop or qs is None:
-        return qs
-    model = qs.model
-    if _model_has_field(model, "barbearia"):
-        return qs.filter(barbearia=shop)
-    if _model_has_field(model, "shop"):
-        return qs.filter(shop=shop)
-    if _model_has_field(model, "barber_shop"):
-        return qs.filter(barber_shop=shop)
-    return qs
-
-
-def user_is_manager(user, shop):
-    """Retorna True se o usuário for OWNER ou MANAGER da barbearia."""
-    return (
-        user.is_authenticated
-        and shop
-        and user.memberships.filter(shop=shop, role__in=["OWNER", "MANAGER"], is_active=True).exists()
-    )
-
-
-def _today_window(d: date):
-    """Retorna janela [start, end) do dia em timezone local."""
-    tz = timezone.get_current_timezone()
-    start = timezone.make_aware(datetime(d.year, d.month, d.day, 0, 0, 0), tz)
-    return start, start + timedelta(days=1)
-
+# relações de Solicitacao para select_related, resolvidas uma vez no import
+_SOL_REL_FIELDS = fk_fields_for(Solicitacao, ("servico", "servico_ref", "cliente")) if HAS_SOL else ()
 
 def _sol_qs(shop=None):
     """Query base de Solicitações com select_related leve (tolerante)."""
     if not HAS_SOL:
         return None
-    qs = Solicitacao.objects.all()
-    for field in ("servico", "servico_ref", "cliente"):
-        try:
-            f = Solicitacao._meta.get_field(field)
-            if getattr(f, "is_relation", False) and (getattr(f, "many_to_one", False) or getattr(f, "one_to_one", False)):
-                qs = qs.select_related(field)
-        except Exception:
-            pass
-    return _apply_shop_filter(qs, shop)
+    qs = Solicitacao.objects.select_related(*_SOL_REL_FIELDS) if _SOL_REL_FIELDS else Solicitacao.objects.all()
+    return apply_shop_filter(qs, shop)
 
 
 # =========================
@@ -109,42 +75,35 @@ def home(request):
 @login_required
 def agenda(request):
     """Lista agendamentos/solicitações confirmadas de HOJE para a barbearia padrão do usuário."""
-    shop = None
-    if request.user.is_authenticated:
-        sid = get_default_shop_for(request.user)
-        if sid:
-            try:
-                shop = BarberShop.objects.get(id=sid)
-            except BarberShop.DoesNotExist:
-                shop = None
+    shop = request.painel_shop  # DashboardContextMiddleware
 
     hoje = timezone.localdate()
     agendamentos = []
 
     if shop and HAS_SOL and SolicitacaoStatus:
-        start_today, end_today = _today_window(hoje)
+        start_today, end_today = today_window(hoje)
         qs = _sol_qs(shop=shop).filter(inicio__gte=start_today, inicio__lt=end_today)
-        qs = qs.filter(
-            Q(status=SolicitacaoStatus.CONFIRMADA)
-            | Q(status=getattr(SolicitacaoStatus, "REALIZADA", None))
-        )
+        # IN em vez de OR: faixa no índice (shop, status, inicio) para cada status
+        statuses = [SolicitacaoStatus.CONFIRMADA]
+        realizada = getattr(SolicitacaoStatus, "REALIZADA", None)
+        if realizada is not None:
+            statuses.append(realizada)
+        qs = qs.filter(status__in=statuses)
         agendamentos = qs.order_by("inicio")
     elif shop and HAS_AG:
-        agendamentos = _apply_shop_filter(
-            Agendamento.objects.filter(inicio__date=hoje), shop
+        # intervalo [início, fim) do dia em vez de inicio__date: usa o índice (shop, inicio)
+        start_today, end_today = today_window(hoje)
+        agendamentos = apply_shop_filter(
+            Agendamento.objects.filter(inicio__gte=start_today, inicio__lt=end_today), shop
         ).order_by("inicio")
 
-    pend_count = 0
-    if shop and HAS_SOL and SolicitacaoStatus:
-        pend_count = _sol_qs(shop=shop).filter(status=SolicitacaoStatus.PENDENTE).count()
-
     ctx = {
         "title": "Agenda",
         "agendamentos": agendamentos,
         "shop": shop,
         "shop_slug": shop.slug if shop else "",
-        "solicitacoes_pendentes_count": pend_count,
-        "is_manager": user_is_manager(request.user, shop),
+        "solicitacoes_pendentes_count": request.pending_count,
+        "is_manager": request.is_manager,
     }
     return render(request, "agendamentos/agenda.html", ctx)
 
@@ -162,10 +121,24 @@ def _get_shop_from_request(request):
         return shop
     slug = (request.GET.get("shop") or "").strip()
     if slug:
-        return get_object_or_404(BarberShop, slug=slug)
+        shop = get_shop_by_slug_cached(slug)
+        if shop is None:
+            raise Http404("Barbearia não encontrada.")
+        return shop
     return BarberShop.objects.order_by("id").first()
 
 
+# colunas que painel/solicitacoes.html lê de cada linha (as FKs ficam para o select_related)
+_SOL_LIST_FIELDS = (
+    "id", "nome", "telefone", "status", "inicio", "criado_em", "servico_nome",
+    "cliente", "cliente__nome", "cliente__telefone", "servico", "servico__nome",
+)
+_AG_LIST_FIELDS = (
+    "id", "inicio", "status", "cliente_nome", "servico_nome",
+    "cliente", "cliente__nome", "cliente__telefone", "servico", "servico__nome",
+)
+
+
 @login_required
 def solicitacoes(request):
     """Listagem de solicitações com filtros simples, tolerante a permissões."""
@@ -176,7 +149,7 @@ def solicitacoes(request):
             "shop": shop,
             "shop_slug": shop.slug if shop else "",
             "list_kind": "solicitacoes",
-            "solicitacoes": Paginator(Solicitacao.objects.none(), 20).get_page(1) if HAS_SOL else [],
+            "solicitacoes": _EMPTY_PAGE if HAS_SOL else [],
             "page_obj": None,
             "filters": {"q": "", "status": ""},
             "alertas": {"sem_confirmacao": 0, "inativos_30d": 0, "solicitacoes_pendentes": 0},
@@ -190,8 +163,29 @@ def solicitacoes(request):
 
     admin = is_shop_admin(request.user)
 
-    def paginar(qs):
-        return Paginator(qs, 20).get_page(request.GET.get("page"))
+    def count_key(prefix, status_key):
+        # COUNT da listagem em cache curto, por barbearia/filtro/escopo; a versão das
+        # solicitações troca a chave a cada gravação (confirmar/recusar não deixa total velho)
+        # (busca longa não: a chave raramente se repetiria)
+        if len(q) > 32:
+            return None
+        escopo = "all" if admin else request.user.pk
+        filtro = hashlib.md5(f"{status_key}|{q}".encode()).hexdigest()
+        return f"{prefix}:{shop.id}:{solicitacoes_version(shop.id)}:{escopo}:{filtro}"
+
+    def paginar(qs, key):
+        # busca textual: o planner estima mal, então mantém o COUNT exato
+        return (CachedCountPaginator(qs, 20, estimate=not q, count_key=key)
+                .get_page(request.GET.get("page")))
+
+    # pendentes visíveis ao usuário (alertas): COUNT exato e fresco, uma vez para os dois
+    # ramos; o total do paginator pode vir do cache ou de estimativa do planner
+    pendentes_count = 0
+    if SolicitacaoStatus:
+        pendentes_count = scope_solicitacoes_qs(
+            Solicitacao.objects.filter(shop=shop, status=SolicitacaoStatus.PENDENTE),
+            request.user, admin, incluir_nao_atribuida=True
+        ).count()
 
     # mapa de status "de agendamento" para facilitar filtro alternativo
     map_ag = {
@@ -207,7 +201,8 @@ def solicitacoes(request):
         ag_status = map_ag[status_]
         aq = (Agendamento.objects
               .filter(shop=shop)
-              .select_related("cliente", "servico", "barbeiro"))
+              .select_related("cliente", "servico")
+              .only(*_AG_LIST_FIELDS))
         aq = scope_agendamentos_qs(aq, request.user, admin)
 
         if ag_status is not None:
@@ -221,15 +216,7 @@ def solicitacoes(request):
                 Q(servico__nome__icontains=q)
             )
 
-        page_obj = paginar(aq.order_by("-inicio"))
-
-        pendentes_count = 0
-        if HAS_SOL and SolicitacaoStatus:
-            pendentes_qs = scope_solicitacoes_qs(
-                Solicitacao.objects.filter(shop=shop, status=SolicitacaoStatus.PENDENTE),
-                request.user, admin, incluir_nao_atribuida=True
-            )
-            pendentes_count = pendentes_qs.count()
+        page_obj = paginar(aq.order_by("-inicio"), count_key("ag_cnt", ag_status))
 
         return render(request, "painel/solicitacoes.html", {
             "title": "Solicitações",
@@ -251,6 +238,7 @@ def solicitacoes(request):
     sq = (Solicitacao.objects
           .filter(shop=shop)
           .select_related("cliente", "servico")
+          .only(*_SOL_LIST_FIELDS)
           .order_by("-criado_em"))
     sq = scope_solicitacoes_qs(sq, request.user, admin, incluir_nao_atribuida=True)
 
@@ -269,15 +257,7 @@ def solicitacoes(request):
         else:
             selected_status = ""
 
-    page_obj = paginar(sq)
-
-    pendentes_count = 0
-    if HAS_SOL and SolicitacaoStatus:
-        pendentes_qs = scope_solicitacoes_qs(
-            Solicitacao.objects.filter(shop=shop, status=SolicitacaoStatus.PENDENTE),
-            request.user, admin, incluir_nao_atribuida=True
-        )
-        pendentes_count = pendentes_qs.count()
+    page_obj = paginar(sq, count_key("sol_cnt", selected_status or "all"))
 
     return render(request, "painel/solicitacoes.html", {
         "title": "Solicitações",
@@ -302,29 +282,19 @@ def solicitacoes(request):
 @login_required
 def clientes(request):
     """Lista de clientes simples, ordenada por criação, da barbearia padrão do usuário."""
-    shop = None
-    if request.user.is_authenticated:
-        sid = get_default_shop_for(request.user)
-        if sid:
-            try:
-                shop = BarberShop.objects.get(id=sid)
-            except BarberShop.DoesNotExist:
-                shop = None
-
-    lista = _apply_shop_filter(Cliente.objects.all(), shop).order_by("-created_at") if (shop and HAS_CLIENTE) else []
-    pend_count = 0
-    if shop and HAS_SOL:
-        pend_qs = _sol_qs(shop=shop)
-        if pend_qs is not None:
-            pend_count = pend_qs.filter(status="PENDENTE").count()
+    shop = request.painel_shop  # DashboardContextMiddleware
 
+    lista = (
+        apply_shop_filter(Cliente.objects.only("id", "nome", "telefone", "created_at").order_by("-created_at"), shop)
+        if (shop and HAS_CLIENTE) else []
+    )
     ctx = {
         "title": "Clientes",
         "clientes": lista,
         "shop": shop,
         "shop_slug": shop.slug if shop else "",
-        "solicitacoes_pendentes_count": pend_count,
-        "is_manager": user_is_manager(request.user, shop),
+        "solicitacoes_pendentes_count": request.pending_count,
+        "is_manager": request.is_manager,
     }
     return render(request, "painel/clientes.html", ctx)
 
@@ -335,15 +305,8 @@ def dashboard(request):
     Redireciona o dashboard padrão para o NOVO dashboard operacional.
     Se o usuário tiver barbearia padrão, usa a rota com <shop_slug>.
     """
-    shop_slug = ""
-    if request.user.is_authenticated:
-        sid = get_default_shop_for(request.user)
-        if sid:
-            try:
-                shop = BarberShop.objects.get(id=sid)
-                shop_slug = shop.slug
-            except BarberShop.DoesNotExist:
-                pass
+    shop = request.painel_shop
+    shop_slug = shop.slug if shop else ""
 
     if shop_slug:
         return redirect("painel:dashboard_op_slug", shop_slug=shop_slug)
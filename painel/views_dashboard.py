@@ -2,22 +2,29 @@
 from __future__ import annotations
 
 from calendar import monthrange
-from collections import defaultdict, deque
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import date, datetime, time, timedelta
 
 from decimal import Decimal
+from functools import lru_cache
+from math import ceil
 
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Sum, Count, F
-from django.shortcuts import get_object_or_404, render, redirect
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db.models import Q, Avg, Sum, Count, F, CharField, DateTimeField, DurationField, ExpressionWrapper, Func, IntegerField, Value
+from django.db.models.functions import Coalesce, Greatest, Least, NullIf
+from django.dispatch import receiver
+from django.http import Http404
+from django.shortcuts import render, redirect
 from django.utils import timezone
 
 # =========================
 # Imports tolerantes
 # =========================
-from barbearias.models import BarberShop
-from barbearias.utils import get_default_shop_for
+from barbearias.utils import get_session_shop, get_shop_by_slug_cached
+from painel.helpers import apply_shop_filter, model_has_field, today_window
 
 try:
     from agendamentos.models import (
@@ -26,23 +33,31 @@ try:
         BarberAvailability,   # se tiver
         BarberTimeOff,        # se tiver
     )
+    from agendamentos.utils import availability_rules_cached
 except Exception:
     Agendamento = None
     StatusAgendamento = None
     BarberAvailability = None
     BarberTimeOff = None
+    availability_rules_cached = None
 
 try:
     from solicitacoes.models import Solicitacao, SolicitacaoStatus
+    from solicitacoes.utils import pending_count_cached, solicitacoes_version
 except Exception:
     Solicitacao = None
     SolicitacaoStatus = None
+    pending_count_cached = None
+    solicitacoes_version = None
 
 try:
     from clientes.models import Cliente, HistoricoItem
+    from clientes.utils import historico_version, kpi_cache_key
 except Exception:
     Cliente = None
     HistoricoItem = None
+    historico_version = None
+    kpi_cache_key = None
 
 # =========================
 # Flags de disponibilidade
@@ -55,6 +70,9 @@ HAS_HIST = HistoricoItem is not None
 WORKDAY_START_H = 8
 WORKDAY_END_H = 20
 DEFAULT_SLOT_MIN = 30
+MONTH_CHARTS_CACHE_TTL = 3600  # segundos; a versão do histórico invalida antes disso
+KPI_MONTH_CACHE_TTL = 60  # segundos
+UTILIZACAO_CACHE_TTL = 120  # segundos; a versão das solicitações invalida antes disso
 
 # =========================
 # Helpers genéricos
@@ -80,8 +98,8 @@ def _holes_next(timeline: dict, base_date: date, horizon_hours=3, step_min=DEFAU
     end = start + timedelta(hours=horizon_hours)
 
     # Reconstrói a lista real de horários (a timeline tem apenas labels)
-    cur = _aware(datetime(base_date.year, base_date.month, base_date.day, start.hour, start.minute))
-    end_lim = _aware(datetime(base_date.year, base_date.month, base_date.day, end.hour, end.minute))
+    cur = _at(base_date, start.hour, start.minute)
+    end_lim = _at(base_date, end.hour, end.minute)
     slots_dt = []
     while cur < end_lim:
         slots_dt.append(cur)
@@ -124,54 +142,57 @@ def _holes_next(timeline: dict, base_date: date, horizon_hours=3, step_min=DEFAU
     holes.sort(key=lambda h: h["minutos"], reverse=True)
     return holes[:5]
 
+# O projeto não ativa fuso por request (timezone.activate): o fuso corrente é sempre o
+# TIME_ZONE do settings, resolvido uma vez (as janelas de mês dependem dele)
+@lru_cache(maxsize=1)
 def _tz():
     return timezone.get_current_timezone()
 
+@receiver(setting_changed)
+def _rebind_tz(*, setting, **kwargs):
+    if setting == "TIME_ZONE":
+        _tz.cache_clear()
+        _month_window.cache_clear()
+
 def _aware(dt: datetime):
     tz = _tz()
     return timezone.make_aware(dt, tz) if timezone.is_naive(dt) else dt.astimezone(tz)
 
-def _today_window(d: date):
-    start = _aware(datetime(d.year, d.month, d.day, 0, 0, 0))
-    return start, start + timedelta(days=1)
+def _at(d: date, hh=0, mm=0, ss=0, tz=None) -> datetime:
+    """Datetime aware de d às hh:mm:ss no fuso local (combine com tzinfo: sem make_aware)."""
+    return datetime.combine(d, time(hh, mm, ss), tzinfo=tz or _tz())
 
+@lru_cache(maxsize=128)
 def _week_bounds(d: date):
     start = d - timedelta(days=d.weekday())  # segunda
     end = start + timedelta(days=6)          # domingo
     return start, end
 
+@lru_cache(maxsize=128)
 def _month_window(d: date):
     first = date(d.year, d.month, 1)
     nxt = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
-    start = _aware(datetime(first.year, first.month, first.day, 0, 0, 0))
-    return start, _aware(datetime(nxt.year, nxt.month, nxt.day, 0, 0, 0))
+    tz = _tz()
+    return datetime.combine(first, time.min, tzinfo=tz), datetime.combine(nxt, time.min, tzinfo=tz)
 
 def _parse_date(s: str, default: date) -> date:
+    # fromisoformat (em C) no lugar do strptime. No 3.11 ele também aceita 20261016 e
+    # datas de semana ISO (2026-W42-5, também com 10 caracteres): exigir os hífens nas
+    # posições do YYYY-MM-DD mantém só o formato de antes
+    if not s or len(s) != 10 or s[4] != "-" or s[7] != "-":
+        return default
     try:
-        return datetime.strptime(s, "%Y-%m-%d").date()
-    except Exception:
+        return date.fromisoformat(s)
+    except (ValueError, TypeError):
         return default
 
-def _apply_shop_filter(qs, shop):
-    if not shop or not qs:
-        return qs
-    model = qs.model
-    try:
-        model._meta.get_field("shop")
-        return qs.filter(shop=shop)
-    except Exception:
-        pass
-    try:
-        model._meta.get_field("barbearia")
-        return qs.filter(barbearia=shop)
-    except Exception:
-        pass
-    try:
-        model._meta.get_field("barber_shop")
-        return qs.filter(barber_shop=shop)
-    except Exception:
-        pass
-    return qs
+class _Minutes(Func):
+    """Inteiro de minutos -> DurationField (interval no Postgres; microssegundos nos demais)."""
+    template = "(%(expressions)s * 60000000)"
+    output_field = DurationField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="make_interval(mins => %(expressions)s)", **extra_context)
 
 def _overlap_minutes(a_start, a_end, b_start, b_end) -> int:
     start = max(a_start, b_start)
@@ -179,30 +200,29 @@ def _overlap_minutes(a_start, a_end, b_start, b_end) -> int:
     delta = (end - start).total_seconds() / 60
     return int(delta) if delta > 0 else 0
 
-def _safe_duration_minutes(obj) -> int:
+# relações de onde sai a duração, por modelo (resolvidas uma vez no import)
+_DUR_REL_NAMES = ("servico", "servico_ref")
+_DUR_RELS = {
+    m: tuple(n for n in _DUR_REL_NAMES if model_has_field(m, n))
+    for m in (Agendamento, Solicitacao) if m is not None
+}
+
+def _dur_min_expr(model):
     """
-    Tenta inferir duração a partir do serviço ligado ao objeto (Agendamento ou Solicitacao).
-    Fallback: 30 min.
+    Duração (min) do serviço como expressão SQL (base do fim efetivo em _fim_expr):
+    1º serviço ligado com duração > 0, senão DEFAULT_SLOT_MIN.
     """
-    dur = None
-    serv = getattr(obj, "servico", None) or getattr(obj, "servico_ref", None)
-    if serv:
-        dur = getattr(serv, "duracao_minutos", None) or getattr(serv, "duracao", None) or getattr(serv, "duracao_min", None)
-        if hasattr(dur, "total_seconds"):
-            dur = int(dur.total_seconds() // 60)
-    return int(dur or DEFAULT_SLOT_MIN)
-
-def _calc_fim(obj, default_min=DEFAULT_SLOT_MIN):
-    if getattr(obj, "fim", None):
-        return obj.fim
-    if getattr(obj, "inicio", None):
-        return obj.inicio + timedelta(minutes=_safe_duration_minutes(obj) or default_min)
-    return None
+    parts = []
+    for rel in _DUR_RELS.get(model, ()):
+        rel_model = model._meta.get_field(rel).related_model
+        if model_has_field(rel_model, "duracao_min"):
+            parts.append(NullIf(f"{rel}__duracao_min", 0))
+    return Coalesce(*parts, Value(DEFAULT_SLOT_MIN), output_field=IntegerField())
 
 def _day_slots(d: date, start_h=WORKDAY_START_H, end_h=WORKDAY_END_H, step_min=DEFAULT_SLOT_MIN):
     tz = _tz()
-    cur = _aware(datetime(d.year, d.month, d.day, start_h, 0, 0))
-    end = _aware(datetime(d.year, d.month, d.day, end_h, 0, 0))
+    cur = _at(d, start_h, tz=tz)
+    end = _at(d, end_h, tz=tz)
     step = timedelta(minutes=step_min)
     out = []
     while cur < end:
@@ -219,39 +239,49 @@ def _work_minutes_for_user_on_day(user, d: date, fallback_min: int) -> int:
     if not (user and getattr(user, "is_authenticated", False) and BarberAvailability):
         return fallback_min or total_min
 
-    day_start, day_end = _today_window(d)
-    weekday = d.weekday()
-    rules = BarberAvailability.objects.filter(barbeiro=user, weekday=weekday, is_active=True)
+    # só os dois horários de cada regra (tuplas, sem instanciar modelos), via cache
+    rules = availability_rules_cached(user.pk, d.weekday())
 
     tz = _tz()
     win = []
-    for r in rules:
-        ws = _aware(datetime(d.year, d.month, d.day, r.start_time.hour, r.start_time.minute))
-        we = _aware(datetime(d.year, d.month, d.day, r.end_time.hour, r.end_time.minute))
+    for st, et in rules:
+        ws = _at(d, st.hour, st.minute, tz=tz)
+        we = _at(d, et.hour, et.minute, tz=tz)
         if we > ws:
             win.append((ws, we))
 
-    # Desconta folgas/bloqueios
-    if BarberTimeOff:
-        offs = BarberTimeOff.objects.filter(barbeiro=user, start__lt=day_end, end__gt=day_start)
-        for i, (ws, we) in enumerate(list(win)):
-            for off in offs:
-                cut = _overlap_minutes(ws, we, off.start, off.end)
-                if cut:
-                    # simplificação: subtrai direto do total
-                    pass
+    total = sum(int((we - ws).total_seconds() / 60) for (ws, we) in win)
+
+    # Desconta folgas/bloqueios (o KPI de utilização passa a considerá-las). As folgas do
+    # dia vêm numa consulta só (poucas linhas) e são unidas antes do desconto: duas folgas
+    # sobrepostas não podem tirar os mesmos minutos duas vezes
+    if BarberTimeOff and win:
+        day_start, day_end = min(ws for ws, _ in win), max(we for _, we in win)
+        offs = []
+        for s, e in (BarberTimeOff.objects.filter(barbeiro=user, start__lt=day_end, end__gt=day_start)
+                     .order_by("start").values_list("start", "end")):
+            if offs and s <= offs[-1][1]:
+                if e > offs[-1][1]:
+                    offs[-1] = (offs[-1][0], e)
+            else:
+                offs.append((s, e))
+        for ws, we in win:
+            for s, e in offs:
+                total -= _overlap_minutes(ws, we, s, e)
 
-    # total direto
-    total = sum(int((we - ws).total_seconds() / 60) for (ws, we) in win) or total_min
-    return max(0, total)
+    return max(0, total) if win else total_min
 
 # =========================
 # Query helpers (ag/sol)
 # =========================
+# colunas que a timeline lê de cada intervalo (tuplas nomeadas, sem instanciar modelos);
+# depois delas vêm as anotações cli_nome/fim_eff/kind, na mesma ordem nos dois modelos
+_INTERVAL_VALUES = ("id", "inicio", "status", "servico_nome", "cliente__nome", "servico__nome")
+
 def _ag_qs(shop, start=None, end=None, barbeiro=None):
     if not HAS_AG:
         return None
-    qs = _apply_shop_filter(Agendamento.objects.all(), shop).select_related("cliente", "servico")
+    qs = apply_shop_filter(Agendamento.objects.all(), shop)
     if start is not None and end is not None:
         qs = qs.filter(inicio__isnull=False, inicio__gte=start, inicio__lt=end)
     # Exclui cancelado
@@ -265,7 +295,7 @@ def _ag_qs(shop, start=None, end=None, barbeiro=None):
 def _sol_qs(shop, start=None, end=None, barbeiro=None):
     if not HAS_SOL:
         return None
-    qs = _apply_shop_filter(Solicitacao.objects.all(), shop).select_related("cliente", "servico")
+    qs = apply_shop_filter(Solicitacao.objects.all(), shop)
     if start is not None and end is not None:
         qs = qs.filter(inicio__isnull=False, inicio__gte=start, inicio__lt=end)
 
@@ -279,21 +309,77 @@ def _sol_qs(shop, start=None, end=None, barbeiro=None):
         qs = qs.filter(Q(barbeiro=barbeiro) | Q(barbeiro__isnull=True))
     return qs
 
-def _to_intervals(qs):
+def _fim_expr(model):
+    """Fim efetivo em SQL: fim gravado, senão início + duração do serviço (ou slot padrão)."""
+    return Coalesce(
+        "fim",
+        ExpressionWrapper(F("inicio") + _Minutes(_dur_min_expr(model)), output_field=DateTimeField()),
+    )
+
+def _busy_rows(qs):
+    """Tuplas (inicio, fim efetivo) do queryset, sem instanciar modelos."""
+    if qs is None:
+        return None
+    return qs.annotate(_fim=_fim_expr(qs.model)).order_by().values_list("inicio", "_fim")
+
+def _union_all(parts, order_by=None):
+    """UNION ALL dos querysets (já projetados) que existirem; [] se nenhum."""
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return []
+    qs = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+    return qs.order_by(order_by) if order_by else qs
+
+def _busy_qs(shop, start, end, barbeiro=None):
+    """(inicio, fim efetivo) de agendamentos + solicitações numa consulta só (UNION ALL)."""
+    return _union_all((
+        _busy_rows(_ag_qs(shop, start, end, barbeiro)),
+        _busy_rows(_sol_qs(shop, start, end, barbeiro)),
+    ))
+
+def _interval_rows(qs, kind: str, cli_nome):
+    if qs is None:
+        return None
+    return qs.annotate(
+        cli_nome=cli_nome, fim_eff=_fim_expr(qs.model), kind=Value(kind, output_field=CharField()),
+    ).order_by().values_list(*_INTERVAL_VALUES, "cli_nome", "fim_eff", "kind", named=True)
+
+def _day_intervals(shop, start, end, barbeiro=None):
     """
-    Normaliza em [(ini, fim, obj)] com TZ local e fim calculado se necessário.
+    Agendamentos e solicitações do período numa consulta só (UNION ALL com a coluna
+    `kind`), separados em ([(ini, fim, row)] de agendamentos, idem de solicitações) com TZ
+    local; `row` é a tupla nomeada das colunas da timeline, fim efetivo já vem do banco.
     """
-    if not qs:
-        return []
+    rows = _union_all((
+        _interval_rows(_ag_qs(shop, start, end, barbeiro), "ag", F("cliente_nome")),
+        # Solicitacao não tem cliente_nome: coluna vazia só para alinhar o UNION
+        _interval_rows(_sol_qs(shop, start, end, barbeiro), "sol", Value("", output_field=CharField())),
+    ), order_by="inicio")
     tz = _tz()
-    out = []
-    for obj in qs.order_by("inicio"):
-        if not obj.inicio:
-            continue
-        ini = timezone.localtime(obj.inicio, tz)
-        fim = _calc_fim(obj) or obj.inicio
-        fim = timezone.localtime(fim, tz)
-        out.append((ini, fim, obj))
+    ag, sol = [], []
+    for row in rows:
+        ini = timezone.localtime(row.inicio, tz)
+        fim = timezone.localtime(row.fim_eff or row.inicio, tz)
+        (ag if row.kind == "ag" else sol).append((ini, fim, row))
+    return ag, sol
+
+def _slot_buckets(intervals, slots, step_min=DEFAULT_SLOT_MIN) -> dict:
+    """
+    {índice do slot: (row, é_o_slot_inicial)} para os slots cujo horário cai em
+    [ini, fim) de algum intervalo. Cada intervalo escreve só nos slots que cobre; com a
+    lista ordenada por início, o primeiro a cobrir um slot fica com ele.
+    """
+    out = {}
+    if not (intervals and slots):
+        return out
+    s0 = slots[0]
+    step_s = step_min * 60
+    n = len(slots)
+    for ini, fim, row in intervals:
+        k0 = max(0, ceil((ini - s0).total_seconds() / step_s))
+        k1 = min(n, ceil((fim - s0).total_seconds() / step_s))
+        for k in range(k0, k1):
+            out.setdefault(k, (row, slots[k] < ini + timedelta(seconds=step_s)))
     return out
 
 # =========================
@@ -303,38 +389,37 @@ def _timeline_for_day(shop, base_date: date, barbeiro=None):
     labels = []
     items = []  # lista paralela a labels; cada posição recebe {kind, title, status, id?}
     slots = _day_slots(base_date, WORKDAY_START_H, WORKDAY_END_H, DEFAULT_SLOT_MIN)
-    slot_step = timedelta(minutes=DEFAULT_SLOT_MIN)
 
-    start, end = _today_window(base_date)
-    ag = _to_intervals(_ag_qs(shop, start, end, barbeiro))
-    sol = _to_intervals(_sol_qs(shop, start, end, barbeiro))
+    start, end = today_window(base_date)
+    ag_iv, sol_iv = _day_intervals(shop, start, end, barbeiro)
+    ag = _slot_buckets(ag_iv, slots, DEFAULT_SLOT_MIN)
+    sol = _slot_buckets(sol_iv, slots, DEFAULT_SLOT_MIN)
 
-    for dt in slots:
+    for k, dt in enumerate(slots):
         labels.append(dt.strftime("%H:%M"))
         item = {"kind": "livre", "title": "Livre", "status": "LIVRE", "id": None}
-        ag_matches = [iv for iv in ag if iv[0] <= dt < iv[1]]
-        sol_matches = [iv for iv in sol if iv[0] <= dt < iv[1]]
+        ag_hit = ag.get(k)
+        sol_hit = sol.get(k)
 
         # prioridade para agendamento
-        if ag_matches:
-            a0, a1, obj = ag_matches[0]
-            if a0 <= dt < a0 + slot_step:
+        if ag_hit:
+            obj, is_start = ag_hit
+            if is_start:
                 item = {
                     "kind": "agendamento",
-                    "title": f"{obj.cliente_nome or getattr(getattr(obj,'cliente',None),'nome','—')} · {obj.servico_nome or getattr(getattr(obj,'servico',None),'nome','—')}",
-                    "status": str(getattr(obj, "status", "")),
+                    "title": f"{obj.cli_nome or obj.cliente__nome or '—'} · {obj.servico_nome or obj.servico__nome or '—'}",
+                    "status": str(obj.status or ""),
                     "id": obj.id,
                 }
             else:
                 item = {"kind": "ocupado", "title": "Em atendimento", "status": "OCUPADO", "id": None}
-        elif sol_matches:
-            s0, s1, obj = sol_matches[0]
-            if s0 <= dt < s0 + slot_step:
-                st = str(getattr(obj, "status", "PENDENTE"))
+        elif sol_hit:
+            obj, is_start = sol_hit
+            if is_start:
                 item = {
                     "kind": "solicitacao",
-                    "title": f"{getattr(obj,'cliente_nome',None) or getattr(getattr(obj,'cliente',None),'nome','—')} · {getattr(obj,'servico_nome',None) or getattr(getattr(obj,'servico',None),'nome','—')}",
-                    "status": st,
+                    "title": f"{obj.cliente__nome or '—'} · {obj.servico_nome or obj.servico__nome or '—'}",
+                    "status": str(obj.status or "PENDENTE"),
                     "id": obj.id,
                 }
             else:
@@ -349,27 +434,29 @@ def _heatmap_week_occup(shop, base_date: date, barbeiro=None):
     val = % ocupação no slot (considera agendamentos+solicitações confirmadas/pendentes).
     """
     wk_start, wk_end = _week_bounds(base_date)
-    days = [wk_start + timedelta(days=i) for i in range(7)]
-    hours = list(range(WORKDAY_START_H, WORKDAY_END_H))  # hora “cheia”
-
-    data = []
-    for yi, d in enumerate(days):
-        start, end = _today_window(d)
-        ag_int = _to_intervals(_ag_qs(shop, start, end, barbeiro))
-        sol_int = _to_intervals(_sol_qs(shop, start, end, barbeiro))
-
-        for xi, hh in enumerate(hours):
-            slot0 = _aware(datetime(d.year, d.month, d.day, hh, 0, 0))
-            slot1 = slot0 + timedelta(hours=1)
-
-            # soma minutos ocupados nesse bloco de 1h
-            occ_min = 0
-            for a0, a1, _ in ag_int:
-                occ_min += _overlap_minutes(a0, a1, slot0, slot1)
-            for s0, s1, _ in sol_int:
-                occ_min += _overlap_minutes(s0, s1, slot0, slot1)
-            pct = min(100, round(occ_min / 60 * 100))
-            data.append([xi, yi, pct])
+    hours = range(WORKDAY_START_H, WORKDAY_END_H)  # hora “cheia”
+    nh = len(hours)
+
+    # uma consulta por modelo para a semana inteira (antes: duas por dia); o fim efetivo
+    # vem calculado no banco e cada intervalo só visita as horas que de fato cobre
+    start, _ = today_window(wk_start)
+    _, end = today_window(wk_end)
+    tz = _tz()
+    one_hour = timedelta(hours=1)
+    occ = [0] * (7 * nh)  # minutos ocupados, plano: posição yi * nh + xi
+    for ini, fim in _busy_qs(shop, start, end, barbeiro):
+        ini = timezone.localtime(ini, tz)
+        fim = timezone.localtime(fim or ini, tz)
+        slot0 = ini.replace(minute=0, second=0, microsecond=0)
+        while slot0 < fim:
+            slot1 = slot0 + one_hour
+            yi = (slot0.date() - wk_start).days
+            if 0 <= yi < 7 and WORKDAY_START_H <= slot0.hour < WORKDAY_END_H:
+                occ[yi * nh + slot0.hour - WORKDAY_START_H] += _overlap_minutes(ini, fim, slot0, slot1)
+            slot0 = slot1
+
+    # [x, y, %] na mesma ordem de antes (dia a dia, hora a hora), direto do vetor plano
+    data = [[i % nh, i // nh, min(100, round(m / 60 * 100))] for i, m in enumerate(occ)]
 
     return {
         "x_labels": [f"{h:02d}h" for h in hours],
@@ -379,30 +466,31 @@ def _heatmap_week_occup(shop, base_date: date, barbeiro=None):
 
 def _funnel_7d(shop, base_date: date, barbeiro=None):
     start = base_date - timedelta(days=6)
-    start_dt = _aware(datetime(start.year, start.month, start.day, 0, 0, 0))
-    end_dt = _aware(datetime(base_date.year, base_date.month, base_date.day, 23, 59, 59))
+    start_dt = _at(start)
+    end_dt = _at(base_date, 23, 59, 59)
 
     total = confirm = noshow = 0
 
     # entradas (solicitações criadas no período)
     if HAS_SOL:
-        qs = _apply_shop_filter(Solicitacao.objects.all(), shop).filter(criado_em__gte=start_dt, criado_em__lte=end_dt)
+        qs = apply_shop_filter(Solicitacao.objects.all(), shop).filter(criado_em__gte=start_dt, criado_em__lte=end_dt)
         if barbeiro:
             qs = qs.filter(Q(barbeiro=barbeiro) | Q(barbeiro__isnull=True))
-        total = qs.count()
-
         # confirmadas/realizadas
         ok_values = [
             getattr(SolicitacaoStatus, "CONFIRMADA", "CONFIRMADA"),
             getattr(SolicitacaoStatus, "REALIZADA", "REALIZADA"),
             getattr(SolicitacaoStatus, "FINALIZADA", getattr(SolicitacaoStatus, "REALIZADA", "REALIZADA")),
         ]
-        confirm = qs.filter(status__in=ok_values).count()
-
         # no-show (se tiver)
         ns = getattr(SolicitacaoStatus, "NO_SHOW", None)
+
+        # total/confirmadas/no-show num único aggregate (uma varredura em vez de três COUNTs)
+        aggs = {"total": Count("id"), "confirm": Count("id", filter=Q(status__in=ok_values))}
         if ns is not None:
-            noshow = qs.filter(status=ns).count()
+            aggs["noshow"] = Count("id", filter=Q(status=ns))
+        agg = qs.aggregate(**aggs)
+        total, confirm, noshow = agg["total"], agg["confirm"], agg.get("noshow", 0)
 
     conv_pct = round((confirm / total) * 100) if total else 0
     return {"total": total, "confirmadas": confirm, "noshow": noshow, "conv_pct": conv_pct}
@@ -411,32 +499,35 @@ def _revenue_daily_month(shop, base_date: date):
     """
     Faturamento diário do mês (HistoricoItem). Retorna labels, values e média móvel 7d.
     """
-    labels, values = [], []
     ma7 = []
 
     if not HAS_HIST:
-        return {"labels": labels, "values": values, "ma7": ma7}
+        return {"labels": [], "values": [], "ma7": ma7}
 
     first = date(base_date.year, base_date.month, 1)
     days = monthrange(base_date.year, base_date.month)[1]
     dlist = [first + timedelta(days=i) for i in range(days)]
 
     start, end = _month_window(base_date)
-    qs = _apply_shop_filter(HistoricoItem.objects.filter(data__gte=start, data__lt=end, faltou=False), shop)
-
-    totals = {d: Decimal("0.00") for d in dlist}
-    for row in qs.values("data").annotate(total=Sum("valor")):
-        key = row["data"].date()
-        if key in totals:
-            totals[key] = row["total"] or Decimal("0.00")
-
-    window = deque(maxlen=7)
-    for d in dlist:
-        labels.append(d.strftime("%d/%m"))
-        v = float(totals[d] or 0)
-        values.append(v)
-        window.append(v)
-        ma7.append(round(sum(window) / len(window), 2))
+    qs = apply_shop_filter(HistoricoItem.objects.filter(data__gte=start, data__lt=end, faltou=False), shop)
+
+    # posição do dia no mês -> total (lista, sem dict de Decimals); float uma vez por linha
+    values = [0.0] * days
+    # tuplas em streaming (sem um dict por linha nem a lista inteira em memória)
+    rows = qs.values("data").annotate(total=Sum("valor")).values_list("data", "total")
+    for data, total in rows.iterator(chunk_size=2000):
+        i = (data.date() - first).days
+        if 0 <= i < days:
+            values[i] = float(total or 0)
+
+    # média móvel 7d com soma corrente: entra o dia atual, sai o de 7 dias atrás
+    acc = 0.0
+    for i, v in enumerate(values):
+        acc += v
+        if i >= 7:
+            acc -= values[i - 7]
+        ma7.append(round(acc / min(i + 1, 7), 2))
+    labels = [d.strftime("%d/%m") for d in dlist]
     return {"labels": labels, "values": values, "ma7": ma7}
 
 def _top_services_month(shop, base_date: date, limit=8):
@@ -448,7 +539,7 @@ def _top_services_month(shop, base_date: date, limit=8):
 
     # HistoricoItem (melhor para faturamento)
     if HAS_HIST:
-        qs = _apply_shop_filter(HistoricoItem.objects.filter(data__gte=start, data__lt=end, faltou=False), shop)
+        qs = apply_shop_filter(HistoricoItem.objects.filter(data__gte=start, data__lt=end, faltou=False), shop)
         rows = (
             qs.values("servico")
             .annotate(qtd=Count("id"))
@@ -462,7 +553,7 @@ def _top_services_month(shop, base_date: date, limit=8):
     # Fallback: Agendamentos/Solicitações confirmadas
     base_labels = defaultdict(int)
     if HAS_AG:
-        ag = _apply_shop_filter(
+        ag = apply_shop_filter(
             Agendamento.objects.filter(inicio__gte=start, inicio__lt=end).exclude(
                 status=getattr(StatusAgendamento, "CANCELADO", None)
             ),
@@ -477,7 +568,7 @@ def _top_services_month(shop, base_date: date, limit=8):
             getattr(SolicitacaoStatus, "REALIZADA", "REALIZADA"),
             getattr(SolicitacaoStatus, "FINALIZADA", getattr(SolicitacaoStatus, "REALIZADA", "REALIZADA")),
         ]
-        sol = _apply_shop_filter(
+        sol = apply_shop_filter(
             Solicitacao.objects.filter(inicio__gte=start, inicio__lt=end, status__in=ok_values), shop
         )
         for s in sol.values("servico_nome").annotate(qtd=Count("id")).order_by("-qtd")[:limit]:
@@ -494,7 +585,7 @@ def _ranking_clientes_month(shop, base_date: date, limit=10):
     if not HAS_HIST:
         return rows
     start, end = _month_window(base_date)
-    qs = _apply_shop_filter(HistoricoItem.objects.filter(data__gte=start, data__lt=end, faltou=False), shop)
+    qs = apply_shop_filter(HistoricoItem.objects.filter(data__gte=start, data__lt=end, faltou=False), shop)
     for r in (
         qs.values("cliente__nome")
         .annotate(total=Sum("valor"), visitas=Count("id"))
@@ -505,28 +596,105 @@ def _ranking_clientes_month(shop, base_date: date, limit=10):
         )
     return rows
 
-def _kpis_basic(shop, base_date: date, user):
-    # faturamento/ticket/clientes
+def _month_charts(shop, base_date: date):
+    """
+    Faturamento diário, top serviços e ranking de clientes do mês. Como só dependem do
+    HistoricoItem, ficam em cache por (barbearia, mês, versão do histórico); qualquer
+    gravação no histórico muda a versão e a próxima renderização recalcula.
+    """
+    def _compute():
+        return {
+            "rev": _revenue_daily_month(shop, base_date),
+            "top_srv": _top_services_month(shop, base_date, limit=8),
+            "ranking": _ranking_clientes_month(shop, base_date, limit=10),
+        }
+
+    if not (HAS_HIST and historico_version):
+        return _compute()
+    key = f"dash_charts:{shop.pk}:{base_date:%Y%m}:{historico_version(shop.pk)}"
+    data = cache.get(key)
+    if data is None:
+        data = _compute()
+        cache.set(key, data, MONTH_CHARTS_CACHE_TTL)
+    return data
+
+def _kpis_month(shop, base_date: date):
+    """
+    Faturamento/ticket/clientes novos do mês. Em cache curto por (barbearia, mês, versão do
+    histórico): gravações no histórico trocam a chave e clientes novos a apagam (sinais).
+    """
+    if kpi_cache_key is None:
+        return _compute_kpis_month(shop, base_date)
+    return cache.get_or_set(
+        kpi_cache_key(shop.pk, base_date),
+        lambda: _compute_kpis_month(shop, base_date),
+        KPI_MONTH_CACHE_TTL,
+    )
+
+def _compute_kpis_month(shop, base_date: date):
     faturamento_mes = Decimal("0.00")
     ticket_medio = Decimal("0.00")
     clientes_novos_mes = 0
 
     if HAS_HIST:
         start_m, end_m = _month_window(base_date)
-        qsm = _apply_shop_filter(HistoricoItem.objects.filter(data__gte=start_m, data__lt=end_m, faltou=False), shop)
-        faturamento_mes = qsm.aggregate(total=Sum("valor"))["total"] or Decimal("0.00")
-        atend_mes = qsm.count()
-        ticket_medio = (faturamento_mes / atend_mes) if atend_mes else Decimal("0.00")
+        qsm = apply_shop_filter(HistoricoItem.objects.filter(data__gte=start_m, data__lt=end_m), shop)
+        # faturamento e ticket médio do mês numa única passada (sem no-show); valor nulo
+        # conta como 0 na média, como na divisão faturamento / atendimentos
+        agg = qsm.aggregate(
+            fat=Sum("valor", filter=Q(faltou=False)),
+            ticket=Avg(Coalesce("valor", Value(Decimal("0"))), filter=Q(faltou=False)),
+        )
+        faturamento_mes = agg["fat"] or Decimal("0.00")
+        ticket_medio = agg["ticket"] or Decimal("0.00")
 
     if HAS_CLIENTE:
         start_m, end_m = _month_window(base_date)
-        clientes_novos_mes = _apply_shop_filter(Cliente.objects.all(), shop).filter(
+        clientes_novos_mes = apply_shop_filter(Cliente.objects.all(), shop).filter(
             created_at__gte=start_m, created_at__lt=end_m
         ).count()
 
-    # ocupação de hoje (min confirmados / janela)
+    return {
+        "faturamento_mes": faturamento_mes,
+        "ticket_medio": ticket_medio,
+        "clientes_novos_mes": clientes_novos_mes,
+    }
+
+def _kpis_basic(shop, base_date: date, user):
+    # faturamento/ticket/clientes
+    kpis = _kpis_month(shop, base_date)
+
+    # ocupação de hoje
+    utilizacao_hoje = _utilizacao_hoje(shop, user)
+
+    # pendências
+    pendentes = 0
+    if HAS_SOL:
+        pendentes = pending_count_cached(shop.pk) if shop else apply_shop_filter(
+            Solicitacao.objects.filter(status=SolicitacaoStatus.PENDENTE), shop
+        ).count()
+
+    return {
+        **kpis,
+        "utilizacao_hoje": utilizacao_hoje,
+        "pendencias": pendentes,
+    }
+
+def _utilizacao_hoje(shop, user):
+    """
+    Ocupação de hoje (%). Em cache por (barbearia, dia, usuário, versão das solicitações):
+    qualquer gravação de Solicitacao troca a chave; mudanças de disponibilidade/folga do
+    barbeiro valem no máximo após UTILIZACAO_CACHE_TTL.
+    """
     hoje = timezone.localdate()
-    start_d, end_d = _today_window(hoje)
+    if not (shop and solicitacoes_version):
+        return _compute_utilizacao_hoje(shop, hoje, user)
+    key = f"util:{shop.pk}:{hoje:%Y%m%d}:{user.pk}:{solicitacoes_version(shop.pk)}"
+    return cache.get_or_set(key, lambda: _compute_utilizacao_hoje(shop, hoje, user), UTILIZACAO_CACHE_TTL)
+
+def _compute_utilizacao_hoje(shop, hoje: date, user):
+    # min confirmados / janela de trabalho
+    start_d, end_d = today_window(hoje)
     total_min = _work_minutes_for_user_on_day(user, hoje, (WORKDAY_END_H - WORKDAY_START_H) * 60)
 
     booked_min = 0
@@ -536,30 +704,25 @@ def _kpis_basic(shop, base_date: date, user):
             getattr(SolicitacaoStatus, "REALIZADA", "REALIZADA"),
             getattr(SolicitacaoStatus, "FINALIZADA", getattr(SolicitacaoStatus, "REALIZADA", "REALIZADA")),
         ]
-        for s in _apply_shop_filter(
+        # fim efetivo (fim gravado, senão início + duração do serviço, senão slot padrão) e
+        # sobreposição com o dia somados no banco: uma linha, sem carregar as solicitações
+        fim_eff = _fim_expr(Solicitacao)
+        booked = apply_shop_filter(
             Solicitacao.objects.filter(status__in=ok_values, inicio__gte=start_d, inicio__lt=end_d), shop
-        ):
-            s_fim = _calc_fim(s) or s.inicio
-            booked_min += _overlap_minutes(s.inicio, s_fim, start_d, end_d)
-    utilizacao_hoje = int(round((booked_min / total_min) * 100)) if total_min else 0
-
-    # pendências
-    pendentes = 0
-    if HAS_SOL:
-        pendentes = _apply_shop_filter(Solicitacao.objects.filter(status=SolicitacaoStatus.PENDENTE), shop).count()
-
-    return {
-        "faturamento_mes": faturamento_mes,
-        "ticket_medio": ticket_medio,
-        "clientes_novos_mes": clientes_novos_mes,
-        "utilizacao_hoje": utilizacao_hoje,
-        "pendencias": pendentes,
-    }
+        ).aggregate(
+            total=Sum(ExpressionWrapper(
+                Least(fim_eff, Value(end_d)) - Greatest("inicio", Value(start_d)),
+                output_field=DurationField(),
+            ))
+        )["total"]
+        if booked:
+            booked_min = max(0, int(booked.total_seconds() // 60))
+    return int(round((booked_min / total_min) * 100)) if total_min else 0
 
 def _today_work_window(d: date):
     """Retorna [work_start, work_end] aware para hoje, usando janela padrão."""
-    ws = _aware(datetime(d.year, d.month, d.day, WORKDAY_START_H, 0, 0))
-    we = _aware(datetime(d.year, d.month, d.day, WORKDAY_END_H, 0, 0))
+    ws = _at(d, WORKDAY_START_H)
+    we = _at(d, WORKDAY_END_H)
     return ws, we
 
 def _busy_intervals_for_range(shop, start: datetime, end: datetime, barbeiro=None):
@@ -569,39 +732,49 @@ def _busy_intervals_for_range(shop, start: datetime, end: datetime, barbeiro=Non
         e = min(a1, end)
         return (s, e) if e > s else None
 
+    # só (inicio, fim efetivo): os buracos não precisam das demais colunas
+    tz = _tz()
     out = []
-    for ini, fim, _ in _to_intervals(_ag_qs(shop, start, end, barbeiro)):
-        c = _clip(ini, fim);  out.append(c) if c else None
-    for ini, fim, _ in _to_intervals(_sol_qs(shop, start, end, barbeiro)):
-        c = _clip(ini, fim);  out.append(c) if c else None
+    for ini, fim in _busy_qs(shop, start, end, barbeiro):
+        c = _clip(timezone.localtime(ini, tz), timezone.localtime(fim or ini, tz))
+        if c:
+            out.append(c)
     return out
 
-def _merge_intervals(intervals: list[tuple[datetime, datetime]]):
-    """Une intervalos [(a,b)] sobrepostos/contíguos."""
-    if not intervals:
-        return []
-    xs = sorted(intervals, key=lambda p: p[0])
-    merged = [xs[0]]
-    for s, e in xs[1:]:
-        ls, le = merged[-1]
-        if s <= le:
-            merged[-1] = (ls, max(le, e))
-        else:
-            merged.append((s, e))
-    return merged
-
 def _free_windows_between(start: datetime, end: datetime, busy: list[tuple[datetime, datetime]]):
     """Calcula janelas livres no [start,end] subtraindo intervalos ocupados."""
+    # varredura única em ordem de início: `cur` avança até o maior fim visto, o que já
+    # absorve sobreposições/contíguos sem montar a lista de intervalos unidos antes
     holes = []
     cur = start
-    for s, e in _merge_intervals([iv for iv in busy if iv]):
+    for s, e in sorted((iv for iv in busy if iv), key=lambda p: p[0]):
         if cur < s:
             holes.append((cur, s))
-        cur = max(cur, e)
+        if e > cur:
+            cur = e
     if cur < end:
         holes.append((cur, end))
     return holes
 
+def _resolve_shop(request, shop_slug=None):
+    """
+    Barbearia do dashboard: pelo slug da URL (404 se não existir) ou a ativa na sessão.
+    Ambas vêm do cache de barbearias.utils e ficam no request para chamadas repetidas.
+    """
+    shop = getattr(request, "_dashboard_shop", None)
+    if shop is not None and (not shop_slug or shop.slug == shop_slug):
+        return shop
+    if shop_slug:
+        shop = get_shop_by_slug_cached(shop_slug)
+        if shop is None:
+            raise Http404("Barbearia não encontrada.")
+    elif hasattr(request, "painel_shop"):
+        shop = request.painel_shop  # já resolvida pelo DashboardContextMiddleware
+    else:
+        shop = get_session_shop(request)
+    request._dashboard_shop = shop
+    return shop
+
 # =========================
 # Views
 # =========================
@@ -615,12 +788,7 @@ def dashboard_operacional(request, shop_slug=None):
       - Heatmap semanal (ECharts)
       - Pendências (solicitações PENDENTE)
     """
-    # resolve shop
-    if shop_slug:
-        shop = get_object_or_404(BarberShop, slug=shop_slug)
-    else:
-        sid = get_default_shop_for(request.user)
-        shop = BarberShop.objects.filter(id=sid).first() if sid else None
+    shop = _resolve_shop(request, shop_slug)
     if not shop:
         return redirect("painel:dashboard")
 
@@ -686,17 +854,7 @@ def dashboard_gerencial(request, shop_slug=None):
     """
     Visão gerencial — foca no MÊS, faturamento diário, top serviços, ranking e heatmap geral.
     """
-    # resolve shop
-    shop = None
-    if shop_slug:
-        shop = get_object_or_404(BarberShop, slug=shop_slug)
-    else:
-        sid = get_default_shop_for(request.user)
-        if sid:
-            try:
-                shop = BarberShop.objects.get(id=sid)
-            except BarberShop.DoesNotExist:
-                shop = None
+    shop = _resolve_shop(request, shop_slug)
     if not shop:
         return redirect("painel:dashboard")
 
@@ -706,17 +864,16 @@ def dashboard_gerencial(request, shop_slug=None):
     # KPIs
     kpis = _kpis_basic(shop, base_date, request.user)
 
-    # ECharts — revenue diário
-    rev = _revenue_daily_month(shop, base_date)
-
-    # Top serviços
-    top_srv = _top_services_month(shop, base_date, limit=8)
+    # ECharts — revenue diário, top serviços e ranking (em cache por versão do histórico)
+    charts = _month_charts(shop, base_date)
+    rev = charts["rev"]
+    top_srv = charts["top_srv"]
 
     # Heatmap semanal (padrão: semana da data base)
     heatmap = _heatmap_week_occup(shop, base_date, barbeiro)
 
     # Ranking clientes
-    ranking = _ranking_clientes_month(shop, base_date, limit=10)
+    ranking = charts["ranking"]
 
     # Funil 7d (agregado)
     funnel = _funnel_7d(shop, base_date, barbeiro)
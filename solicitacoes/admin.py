@@ -7,6 +7,7 @@ from django.contrib import admin, messages
 from django.utils import timezone
 
 from .models import Solicitacao, SolicitacaoStatus
+from .utils import invalidate_pending_count
 
 
 # --- Inline opcional do Agendamento (se o app existir) -----------------------
@@ -193,7 +194,11 @@ class SolicitacaoAdmin(admin.ModelAdmin):
 
     @admin.action(description="Negar selecionadas")
     def action_negar(self, request, queryset):
+        shop_ids = set(queryset.filter(status=SolicitacaoStatus.PENDENTE).values_list("shop_id", flat=True))
         updated = queryset.update(status=SolicitacaoStatus.NEGADA)
+        # update() não dispara sinais: invalida o total de pendentes das barbearias afetadas
+        for shop_id in shop_ids:
+            invalidate_pending_count(shop_id)
         self.message_user(request, f"{updated} solicitação(ões) negada(s).", level=messages.SUCCESS)
 
     @admin.action(description="Finalizar selecionadas (só as já iniciadas)")
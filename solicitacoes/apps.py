@@ -6,4 +6,4 @@ class SolicitacoesConfig(AppConfig):
     name = 'solicitacoes'
 
     def ready(self):
-        from . import signals  # noqa
\ No newline at end of file
+        from . import signals  # noqa
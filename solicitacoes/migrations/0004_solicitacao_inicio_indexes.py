@@ -0,0 +1,51 @@
+# Índices por janela de início: (shop, status, inicio) para agenda/dashboards e
+# (shop, barbeiro, inicio) para a agenda de cada barbeiro.
+#
+# No PostgreSQL são criados com CREATE INDEX CONCURRENTLY (sem travar escrita
+# nas solicitações); por isso a migração não é atômica. Nos demais bancos segue
+# o add_index normal.
+
+from django.db import migrations, models
+
+INDEXES = [
+    models.Index(fields=["shop", "status", "inicio"], name="solic_shop_status_inicio"),
+    models.Index(fields=["shop", "barbeiro", "inicio"], name="solic_shop_barbeiro_inicio"),
+]
+
+
+def add_indexes(apps, schema_editor):
+    model = apps.get_model("solicitacoes", "Solicitacao")
+    concurrently = schema_editor.connection.vendor == "postgresql"
+    for index in INDEXES:
+        if concurrently:
+            schema_editor.add_index(model, index, concurrently=True)
+        else:
+            schema_editor.add_index(model, index)
+
+
+def remove_indexes(apps, schema_editor):
+    model = apps.get_model("solicitacoes", "Solicitacao")
+    concurrently = schema_editor.connection.vendor == "postgresql"
+    for index in INDEXES:
+        if concurrently:
+            schema_editor.remove_index(model, index, concurrently=True)
+        else:
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('solicitacoes', '0003_remove_solicitacao_solicitacoe_status_31530a_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(add_indexes, remove_indexes)],
+            state_operations=[
+                migrations.AddIndex(model_name='solicitacao', index=index) for index in INDEXES
+            ],
+        ),
+    ]
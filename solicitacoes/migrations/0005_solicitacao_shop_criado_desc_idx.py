@@ -0,0 +1,49 @@
+# Índice (shop, criado_em DESC) para a listagem do painel sem filtro de status;
+# com status já existe (shop, status, criado_em).
+#
+# Mesmo esquema da 0004: CREATE INDEX CONCURRENTLY no PostgreSQL (migração não
+# atômica) e add_index normal nos demais bancos.
+
+from django.db import migrations, models
+
+INDEXES = [
+    models.Index(fields=["shop", "-criado_em"], name="solic_shop_criado_desc"),
+]
+
+
+def add_indexes(apps, schema_editor):
+    model = apps.get_model("solicitacoes", "Solicitacao")
+    concurrently = schema_editor.connection.vendor == "postgresql"
+    for index in INDEXES:
+        if concurrently:
+            schema_editor.add_index(model, index, concurrently=True)
+        else:
+            schema_editor.add_index(model, index)
+
+
+def remove_indexes(apps, schema_editor):
+    model = apps.get_model("solicitacoes", "Solicitacao")
+    concurrently = schema_editor.connection.vendor == "postgresql"
+    for index in INDEXES:
+        if concurrently:
+            schema_editor.remove_index(model, index, concurrently=True)
+        else:
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('solicitacoes', '0004_solicitacao_inicio_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(add_indexes, remove_indexes)],
+            state_operations=[
+                migrations.AddIndex(model_name='solicitacao', index=index) for index in INDEXES
+            ],
+        ),
+    ]
@@ -57,6 +57,11 @@ class Solicitacao(models.Model):
             models.Index(fields=["shop", "status", "criado_em"]),
             models.Index(fields=["shop", "telefone"]),
             models.Index(fields=["shop", "servico"]),
+            # agenda/dashboards: status + janela de início, e agenda por barbeiro
+            models.Index(fields=["shop", "status", "inicio"], name="solic_shop_status_inicio"),
+            models.Index(fields=["shop", "barbeiro", "inicio"], name="solic_shop_barbeiro_inicio"),
+            # listagem do painel sem filtro de status (ordenada por criação)
+            models.Index(fields=["shop", "-criado_em"], name="solic_shop_criado_desc"),
         ]
         constraints = [
             # Confirmada deve ter início
@@ -3,11 +3,12 @@ from __future__ import annotations
 
 import logging
 import traceback
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
 from .models import Solicitacao, SolicitacaoStatus
+from .utils import bump_solicitacoes_version, invalidate_pending_count
 
 log = logging.getLogger(__name__)
 
@@ -54,6 +55,7 @@ def solicitacao_pre_save(sender, instance: Solicitacao, **kwargs):
     # 3) DETECTORES de transição de status (somente log)
     old_status = getattr(old, "status", None)
     new_status = instance.status
+    instance._status_antes = old_status  # lido no post_save (contador de pendentes)
 
     # qualquer transição é logada em nível INFO
     if old_status != new_status:
@@ -86,6 +88,13 @@ def solicitacao_post_save(sender, instance: Solicitacao, created: bool, **kwargs
     """
     Apenas logging/normalização leve. NÃO cria agendamento aqui.
     """
+    # entrou/saiu de PENDENTE: o total de pendentes em cache fica velho
+    old_status = getattr(instance, "_status_antes", None)
+    if old_status != instance.status and SolicitacaoStatus.PENDENTE in (old_status, instance.status):
+        invalidate_pending_count(instance.shop_id)
+    # ocupação do dia em cache no dashboard
+    bump_solicitacoes_version(instance.shop_id)
+
     if created:
         log.info(
             "[signals][post_save] Criada Solicitação id=%s status=%s inicio=%s shop=%s",
@@ -98,3 +107,10 @@ def solicitacao_post_save(sender, instance: Solicitacao, created: bool, **kwargs
         "[signals][post_save] Persistida Solicitação id=%s status=%s inicio=%s fim=%s",
         instance.pk, instance.status, instance.inicio, instance.fim
     )
+
+
+@receiver(post_delete, sender=Solicitacao)
+def solicitacao_post_delete(sender, instance: Solicitacao, **kwargs):
+    if instance.status == SolicitacaoStatus.PENDENTE:
+        invalidate_pending_count(instance.shop_id)
+    bump_solicitacoes_version(instance.shop_id)
@@ -1,3 +1,57 @@
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from barbearias.models import BarberShop
+from .models import Solicitacao, SolicitacaoStatus
+from .utils import pending_count_cached, solicitacoes_version
+
+
+class SolicitacaoCacheInvalidationTests(TestCase):
+    """Os sinais de Solicitacao invalidam o total de pendentes e a versão das solicitações."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = BarberShop.objects.create(nome="Barbearia Teste", slug="barbearia-teste")
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _nova(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Solicitacao.objects.create(shop=self.shop, nome="Fulano", **kwargs)
+
+    def test_new_pending_invalidates_count(self):
+        self.assertEqual(pending_count_cached(self.shop.pk), 0)
+        self._nova()
+        self.assertEqual(pending_count_cached(self.shop.pk), 1)
+
+    def test_leaving_pending_invalidates_count(self):
+        s = self._nova()
+        self.assertEqual(pending_count_cached(self.shop.pk), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            s.status = SolicitacaoStatus.NEGADA
+            s.save()
+        self.assertEqual(pending_count_cached(self.shop.pk), 0)
+
+    def test_deleting_pending_invalidates_count(self):
+        s = self._nova()
+        self.assertEqual(pending_count_cached(self.shop.pk), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            s.delete()
+        self.assertEqual(pending_count_cached(self.shop.pk), 0)
+
+    def test_save_and_delete_bump_version(self):
+        v0 = solicitacoes_version(self.shop.pk)
+        s = self._nova()
+        v1 = solicitacoes_version(self.shop.pk)
+        self.assertNotEqual(v1, v0)
+        with self.captureOnCommitCallbacks(execute=True):
+            s.delete()
+        self.assertNotEqual(solicitacoes_version(self.shop.pk), v1)
+
+    def test_version_is_per_shop(self):
+        outra = BarberShop.objects.create(nome="Outra", slug="outra")
+        v_outra = solicitacoes_version(outra.pk)
+        self._nova()
+        self.assertEqual(solicitacoes_version(outra.pk), v_outra)
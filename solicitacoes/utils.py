@@ -1,12 +1,17 @@
 # solicitacoes/utils.py
+import time
+
 import requests
 
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.db import transaction
 from core.access import require_shop_member
 
+PENDING_COUNT_CACHE_TTL = 120  # segundos; os sinais de Solicitacao invalidam antes disso
+
 def disparar_evento(solicitacao, evento="CONFIRMADA", session_key=None):
     """
     Dispara um POST para o callback_url da solicitação (se existir).
@@ -44,4 +49,46 @@ def shop_post_view(view):
     wrapped = require_POST(wrapped)
     wrapped = transaction.atomic(wrapped)
     wrapped = login_required(wrapped)
-    return wrapped
\ No newline at end of file
+    return wrapped
+
+
+def pending_count_cache_key(shop_id):
+    return f"pending:{shop_id}"
+
+def pending_count_cached(shop_id):
+    """
+    Total de solicitações PENDENTE da barbearia (badge do painel / KPI do dashboard).
+    Em cache por PENDING_COUNT_CACHE_TTL; toda entrada/saída do status PENDENTE apaga a chave.
+    """
+    from .models import Solicitacao, SolicitacaoStatus
+
+    return cache.get_or_set(
+        pending_count_cache_key(shop_id),
+        lambda: Solicitacao.objects.filter(shop_id=shop_id, status=SolicitacaoStatus.PENDENTE).count(),
+        PENDING_COUNT_CACHE_TTL,
+    )
+
+def invalidate_pending_count(shop_id):
+    """Apaga (após o commit) o total de pendentes em cache da barbearia."""
+    transaction.on_commit(lambda: cache.delete(pending_count_cache_key(shop_id)))
+
+
+def solicitacoes_version_key(shop_id):
+    return f"sol_ver:{shop_id}"
+
+def solicitacoes_version(shop_id):
+    """
+    Versão das solicitações da barbearia: entra na chave da ocupação do dia em cache no
+    dashboard e muda a cada gravação/remoção de Solicitacao (os caches antigos expiram).
+    """
+    return cache.get_or_set(solicitacoes_version_key(shop_id), lambda: int(time.time()), None)
+
+def bump_solicitacoes_version(shop_id):
+    """Invalida os caches derivados das solicitações da barbearia (após o commit)."""
+    def _do():
+        key = solicitacoes_version_key(shop_id)
+        try:
+            cache.incr(key)
+        except ValueError:  # chave sumiu (eviction/restart): recomeça numa versão nova
+            cache.set(key, int(time.time()), None)
+    transaction.on_commit(_do)
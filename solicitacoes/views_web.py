@@ -22,7 +22,7 @@ import requests
 from core import settings
 from barbearias.models import BarberShop, Membership, MembershipRole
 from agendamentos.models import Agendamento, StatusAgendamento
-from core.access import require_shop_member
+from core.access import get_shop_for_user, require_shop_member
 from painel.visibility import is_shop_admin, scope_agendamentos_qs, scope_solicitacoes_qs
 from servicos.models import Servico
 from solicitacoes.helpers import criar_agendamento_from_solicitacao
@@ -42,17 +42,11 @@ def _user_membership(user, shop) -> Membership | None:
 def _get_shop_for_user(request, shop_slug) -> BarberShop:
     """
     Recupera a barbearia pelo slug e **só retorna** se o usuário atual
-    for membro ativo dessa barbearia. Caso contrário -> 404.
+    for membro ativo dessa barbearia. Caso contrário -> 404
+    (para não vazar a existência/nomes de barbearias alheias).
+    Reaproveita o que require_shop_member já deixou no request.
     """
-    shop = get_object_or_404(BarberShop, slug=shop_slug)
-    mem = _user_membership(request.user, shop)
-    if not mem:
-        # 404 para não vazar a existência/nomes de barbearias alheias
-        raise Http404("Barbearia não encontrada.")
-    # opcional: deixar à mão no request
-    request.shop = shop
-    request.membership = mem
-    return shop
+    return get_shop_for_user(request, shop_slug)
 
 def _is_manager(request) -> bool:
     mem = getattr(request, "membership", None)